@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+
+from .metrics import mark_cache
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# Content-codings we can send, most preferred first when the client's
+# q-values tie; each has its own ETag suffix, since the bytes differ.
+ENCODINGS = ("br", "gzip", "identity")
+_ETAG_SUFFIX = {"br": "-br", "gzip": "-gz", "identity": ""}
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """A JSON document pre-serialized (compact) and precompressed once, served as bytes."""
+
+    body: bytes
+    gzip: bytes
+    br: bytes | None
+    etag: str  # of the identity body; see etag_for
+
+    def etag_for(self, encoding: str) -> str:
+        """Strong ETag of the body in the given content-coding."""
+        return self.etag[:-1] + _ETAG_SUFFIX[encoding] + '"'
+
+    def content(self, encoding: str) -> bytes:
+        return {"br": self.br, "gzip": self.gzip}.get(encoding) or self.body
+
+
+def encode_body(obj: object) -> CachedBody:
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return CachedBody(
+        body=body,
+        gzip=gzip.compress(body, compresslevel=6, mtime=0),
+        br=brotli.compress(body) if brotli is not None else None,
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+    )
+
+
+def accepted_encodings(request: Request) -> dict[str, float]:
+    """Accept-Encoding as {coding: q} (lower-cased; q defaults to 1)."""
+    prefs: dict[str, float] = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        prefs[coding] = q
+    return prefs
+
+
+def choose_encoding(request: Request, available: tuple[str, ...] = ENCODINGS) -> str:
+    """
+    The available content-coding with the highest q-value the client sent
+    (ties in `available` order); q=0 refuses a coding. Codings the header
+    does not list take the q of "*" if given, else are not used (identity
+    is, as the least preferred, unless refused). Falls back to identity.
+    """
+    prefs = accepted_encodings(request)
+    best, best_q = "identity", 0.0
+    for coding in available:
+        default = 0.001 if coding == "identity" else 0.0
+        q = prefs.get(coding, prefs.get("*", default))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+def json_response(request: Request, entry: CachedBody, extra_headers: dict | None = None) -> Response:
+    encoding = choose_encoding(request, ENCODINGS if entry.br is not None else ENCODINGS[1:])
+    headers = {
+        **(extra_headers or {}),
+        "ETag": entry.etag_for(encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, headers["ETag"]):
+        mark_cache(request, "not_modified")
+        return Response(status_code=304, headers=headers)
+    mark_cache(request, "hit")
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=entry.content(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.preprocessing.graph_arrow import ArrowGraph
+
+NO_VALUE = -1
+
+
+def gather_rows(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenation of indices[indptr[r]:indptr[r + 1]] for all r in rows."""
+    starts = indptr[rows]
+    lens = indptr[rows + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+    return indices[offsets + np.arange(total)]
+
+
+class GraphIndex:
+    """
+    Undirected CSR adjacency over one graph (node and edge tables, see
+    src/preprocessing/graph_arrow.py), built once per snapshot so subgraph
+    queries are array operations instead of scans over the edge list. Node
+    and edge JSON objects are only made for the rows a response contains.
+    """
+
+    def __init__(self, graph: ArrowGraph) -> None:
+        self.graph = graph
+        self.meta = graph.meta
+        self.ids = graph.ids
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        n = graph.num_nodes
+
+        self.src, self.dst = graph.positions()
+        self.edge_ids = np.arange(len(self.src), dtype=np.int64)
+        if "weight" in graph.edges.column_names:
+            self.weight = graph.edges.column("weight").fill_null(1).to_numpy()
+        else:
+            self.weight = np.ones(len(self.src), dtype=np.int64)
+
+        # Both directions, sorted by row -> CSR.
+        rows = np.r_[self.src, self.dst]
+        cols = np.r_[self.dst, self.src]
+        order = np.argsort(rows, kind="stable")
+        self.indices = cols[order]
+        self.indices_edge = np.r_[self.edge_ids, self.edge_ids][order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+
+        self.degree = np.diff(self.indptr)
+        self.community = self._int_attr("community")
+        self.year = self._int_attr("year")
+
+    def _int_attr(self, key: str) -> np.ndarray:
+        if key not in self.graph.nodes.column_names:
+            return np.full(self.num_nodes, NO_VALUE, dtype=np.int64)
+        col = self.graph.nodes.column(key).cast("int64").fill_null(NO_VALUE)
+        return col.to_numpy().astype(np.int64)
+
+    @property
+    def num_nodes(self) -> int:
+        return self.graph.num_nodes
+
+    def edge(self, a: str, b: str) -> dict | None:
+        """The edge between nodes a and b, if any (KeyError if either is unknown)."""
+        i, j = self.index[a], self.index[b]
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        hit = np.flatnonzero(self.indices[lo:hi] == j)
+        if not len(hit):
+            return None
+        return self.graph.edge_rows(self.indices_edge[lo + hit[:1]], self.ids)[0]
+
+    def ego(self, node_id: str, hops: int = 1) -> np.ndarray:
+        """Node mask of the k-hop neighbourhood of node_id (KeyError if unknown)."""
+        i = self.index[node_id]
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        mask[i] = True
+        frontier = np.asarray([i], dtype=np.int64)
+        for _ in range(hops):
+            nb = np.unique(gather_rows(self.indptr, self.indices, frontier))
+            frontier = nb[~mask[nb]]
+            if len(frontier) == 0:
+                break
+            mask[frontier] = True
+        return mask
+
+    def select(
+        self,
+        community: int | None = None,
+        min_degree: int = 0,
+        year_from: int | None = None,
+        year_to: int | None = None,
+    ) -> np.ndarray:
+        mask = self.degree >= min_degree
+        if community is not None:
+            mask &= self.community == community
+        if year_from is not None:
+            mask &= (self.year != NO_VALUE) & (self.year >= year_from)
+        if year_to is not None:
+            mask &= (self.year != NO_VALUE) & (self.year <= year_to)
+        return mask
+
+    def selection(self, mask: np.ndarray, max_nodes: int = 0, query: dict | None = None) -> tuple[dict, np.ndarray, np.ndarray]:
+        """
+        (meta, node rows, edge rows) of the nodes in mask (optionally only the
+        max_nodes highest-degree ones) and the edges between them.
+        """
+        keep = np.flatnonzero(mask)
+        if max_nodes and len(keep) > max_nodes:
+            top = np.lexsort((keep, -self.degree[keep]))[:max_nodes]
+            keep = np.sort(keep[top])
+            mask = np.zeros(self.num_nodes, dtype=bool)
+            mask[keep] = True
+
+        inside = mask[self.src] & mask[self.dst]
+        meta = dict(self.meta)
+        meta["subgraph"] = {**(query or {}), "nodes": int(len(keep)), "edges": int(inside.sum())}
+        return meta, keep, self.edge_ids[inside]
+
+    def subgraph(self, mask: np.ndarray, max_nodes: int = 0, query: dict | None = None) -> dict:
+        """The selection in the same shape as the full graph JSON."""
+        meta, nodes, edges = self.selection(mask, max_nodes, query)
+        return {
+            "meta": meta,
+            "nodes": self.graph.node_rows(nodes),
+            "edges": self.graph.edge_rows(edges, self.ids),
+        }
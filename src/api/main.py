@@ -1,15 +1,35 @@
 from __future__ import annotations
 
-import json
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache import json_response
+from .graph_index import GraphIndex
+from .metrics import CONTENT_TYPE, Metrics, MetricsMiddleware, mark_cache
+from .store import SnapshotStore
+from .stream import ndjson_response, wants_ndjson
+
 REPO_ROOT = Path(__file__).resolve().parents[2]
 OUT = REPO_ROOT / "data" / "outputs"
 
-app = FastAPI(title="SciSciNet Dartmouth Networks API")
+store = SnapshotStore(OUT)
+metrics = Metrics()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store.start()
+    yield
+    store.stop()
+
+
+app = FastAPI(title="SciSciNet Dartmouth Networks API", lifespan=lifespan)
 
 # CORS for local frontend dev (Vite default port 5173)
 app.add_middleware(
@@ -22,29 +42,137 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# outermost, so latency includes CORS handling and every response is counted
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
-def read_json(path: Path) -> dict:
-    if not path.exists():
-        raise HTTPException(status_code=404, detail=f"File not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+def serve_json(request: Request, name: str) -> Response:
+    snap, entry = store.get(name)
+    return json_response(request, entry, {"X-Snapshot-Version": snap.version})
 
 @app.get("/health")
 def health() -> dict:
-    return {"status": "ok"}
+    return {"status": "ok", "snapshot": store.current().version}
+
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    snap = store.current()
+    text = metrics.render(
+        {"version": snap.version, "loaded_at": snap.loaded_at, "load_seconds": snap.load_seconds}
+    )
+    return PlainTextResponse(text, media_type=CONTENT_TYPE)
+
+def serve_graph(request: Request, name: str, format: str) -> Response:
+    if not wants_ndjson(request, format):
+        return serve_json(request, f"{name}.json")
+    snap = store.current()  # once: header and body come from the same snapshot
+    g = snap.graphs.get(name)
+    if g is None:
+        raise HTTPException(status_code=404, detail=f"Graph not found: {name} (snapshot {snap.version})")
+    return ndjson_response(request, g.meta, g.graph, extra_headers={"X-Snapshot-Version": snap.version})
+
+FORMAT = Query("json", pattern="^(json|ndjson)$")
 
 @app.get("/api/papers_graph")
-def papers_graph() -> dict:
-    return read_json(OUT / "papers_graph.json")
+def papers_graph(request: Request, format: str = FORMAT) -> Response:
+    return serve_graph(request, "papers_graph", format)
 
 @app.get("/api/authors_graph")
-def authors_graph() -> dict:
-    return read_json(OUT / "authors_graph.json")
+def authors_graph(request: Request, format: str = FORMAT) -> Response:
+    return serve_graph(request, "authors_graph", format)
 
 @app.get("/api/t2_timeline")
-def t2_timeline() -> dict:
-    return read_json(OUT / "t2_timeline.json")
+def t2_timeline(request: Request) -> Response:
+    return serve_json(request, "t2_timeline.json")
 
 
 @app.get("/api/t2_patent_counts_by_year")
-def t2_patent_counts_by_year() -> dict:
-    return read_json(OUT / "t2_patent_counts_by_year.json")    
\ No newline at end of file
+def t2_patent_counts_by_year(request: Request) -> Response:
+    return serve_json(request, "t2_patent_counts_by_year.json")    
+
+
+# Precomputed drawing geometry ({name}: papers_graph | authors_graph), built by the
+# optional layout stage (build_layout.py): node positions on the unit circle and
+# bundled-edge control points, served from the snapshot cache like the graphs.
+
+@app.get("/api/{name}/layout")
+def graph_layout(request: Request, name: str) -> Response:
+    snap, entry = store.layout(name)
+    return json_response(request, entry, {"X-Snapshot-Version": snap.version})
+
+
+# Evidence for an author edge: the papers two authors of the current graph share,
+# from the snapshot's authors_graph_papers.json (replaces check_max_author_edge.py +
+# export_shared_papers_with_doi.py).
+
+@app.get("/api/authors_graph/shared_papers")
+def shared_papers(request: Request, a: str, b: str) -> dict:
+    mark_cache(request, "miss")
+    snap = store.current()
+    g = snap.graphs.get("authors_graph")
+    if g is None or snap.shared_papers is None:
+        raise HTTPException(status_code=404, detail=f"Shared papers not built (snapshot {snap.version})")
+    try:
+        edge = g.edge(a, b)
+    except KeyError:
+        missing = a if a not in g.index else b
+        raise HTTPException(status_code=404, detail=f"Node not found: {missing}")
+    papers = snap.shared_papers.shared(a, b)
+    return {
+        "meta": {"snapshot": snap.version, "weight": int(edge["weight"]) if edge else 0, "count": len(papers)},
+        "a": a,
+        "b": b,
+        "papers": papers,
+    }
+
+
+# Subgraph queries over the in-memory adjacency index ({name}: papers_graph | authors_graph).
+# Responses have the same shape as the full graph plus meta.subgraph describing the query;
+# with format=ndjson they are streamed like the full graphs (see stream.py).
+
+def serve_subgraph(
+    request: Request, g: GraphIndex, mask: np.ndarray, max_nodes: int, query: dict, format: str
+) -> Response | dict:
+    if not wants_ndjson(request, format):
+        return g.subgraph(mask, max_nodes, query)
+    meta, nodes, edges = g.selection(mask, max_nodes, query)
+    return ndjson_response(request, meta, g.graph, nodes, edges, g.ids)
+
+@app.get("/api/{name}/ego", response_model=None)
+def ego_network(
+    request: Request,
+    name: str,
+    node: str,
+    hops: int = Query(1, ge=0, le=3),
+    max_nodes: int = Query(0, ge=0),
+    format: str = FORMAT,
+) -> Response | dict:
+    mark_cache(request, "miss")
+    g = store.graph(name)
+    try:
+        mask = g.ego(node, hops)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Node not found: {node}")
+    return serve_subgraph(request, g, mask, max_nodes, {"ego": node, "hops": hops}, format)
+
+
+@app.get("/api/{name}/subgraph", response_model=None)
+def filtered_subgraph(
+    request: Request,
+    name: str,
+    community: int | None = None,
+    min_degree: int = Query(0, ge=0),
+    year_from: int | None = None,
+    year_to: int | None = None,
+    max_nodes: int = Query(0, ge=0),
+    format: str = FORMAT,
+) -> Response | dict:
+    mark_cache(request, "miss")
+    g = store.graph(name)
+    mask = g.select(community, min_degree, year_from, year_to)
+    query = {
+        "community": community,
+        "min_degree": min_degree,
+        "year_from": year_from,
+        "year_to": year_to,
+    }
+    return serve_subgraph(request, g, mask, max_nodes, query, format)
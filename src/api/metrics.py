@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from fastapi import Request
+
+# Request metrics in the Prometheus text format (GET /metrics), kept in-process
+# without a client library. Routes are labelled by their template
+# (/api/{name}/ego), not the raw path, so label sets stay bounded.
+#
+#   sciscinet_http_requests_total{route,method,status}
+#   sciscinet_http_request_duration_seconds{route}   histogram
+#   sciscinet_http_response_bytes{route}             histogram (bytes on the wire)
+#   sciscinet_response_cache_total{route,result}     hit | not_modified | miss
+#   sciscinet_snapshot_info{version}, sciscinet_snapshot_loaded_timestamp_seconds,
+#   sciscinet_snapshot_load_seconds
+#
+# Cache results: "hit" is a body served from the snapshot's precompressed
+# cache, "not_modified" a 304 for a matching ETag, "miss" a body built per
+# request (subgraph queries, shared papers).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(float(1 << k) for k in range(10, 28, 2))  # 1 KiB .. 128 MiB
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+CACHE_STATE = "cache"  # request.state key set by the handlers
+
+
+def mark_cache(request: Request, result: str) -> None:
+    setattr(request.state, CACHE_STATE, result)
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Iterable[float]) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: dict[str, tuple[list[int], list[float]]] = {}  # value -> (counts, [sum])
+
+    def observe(self, value: str, x: float) -> None:
+        counts, total = self._series.setdefault(value, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect_left(self.buckets, x)] += 1
+        total[0] += x
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value in sorted(self._series):
+            counts, total = self._series[value]
+            running = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                bound = "+Inf" if le == float("inf") else _num(le)
+                lines.append(f"{self.name}_bucket{_labels(**{self.label: value, 'le': bound})} {running}")
+            lines.append(f"{self.name}_sum{_labels(**{self.label: value})} {_num(total[0])}")
+            lines.append(f"{self.name}_count{_labels(**{self.label: value})} {running}")
+        return lines
+
+
+class Metrics:
+    """Process-wide request counters and histograms; safe to update from any thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.cache: dict[tuple[str, str], int] = {}
+        self.latency = Histogram(
+            "sciscinet_http_request_duration_seconds", "Request latency by route.", "route", LATENCY_BUCKETS
+        )
+        self.size = Histogram(
+            "sciscinet_http_response_bytes", "Response body bytes sent by route.", "route", BYTES_BUCKETS
+        )
+
+    def observe(self, route: str, method: str, status: int, seconds: float, nbytes: int, cache: str | None) -> None:
+        with self._lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.observe(route, seconds)
+            self.size.observe(route, nbytes)
+            if cache is not None:
+                self.cache[(route, cache)] = self.cache.get((route, cache), 0) + 1
+
+    def render(self, snapshot: dict[str, float | str] | None = None) -> str:
+        with self._lock:
+            lines = [
+                "# HELP sciscinet_http_requests_total Requests by route, method and status.",
+                "# TYPE sciscinet_http_requests_total counter",
+            ]
+            for (route, method, status), n in sorted(self.requests.items()):
+                lines.append(f"sciscinet_http_requests_total{_labels(route=route, method=method, status=status)} {n}")
+            lines += self.latency.render()
+            lines += self.size.render()
+            lines += [
+                "# HELP sciscinet_response_cache_total Response cache results by route.",
+                "# TYPE sciscinet_response_cache_total counter",
+            ]
+            for (route, result), n in sorted(self.cache.items()):
+                lines.append(f"sciscinet_response_cache_total{_labels(route=route, result=result)} {n}")
+        if snapshot:
+            lines += [
+                "# HELP sciscinet_snapshot_info Output snapshot being served.",
+                "# TYPE sciscinet_snapshot_info gauge",
+                f"sciscinet_snapshot_info{_labels(version=snapshot['version'])} 1",
+                "# HELP sciscinet_snapshot_loaded_timestamp_seconds When the served snapshot was loaded.",
+                "# TYPE sciscinet_snapshot_loaded_timestamp_seconds gauge",
+                f"sciscinet_snapshot_loaded_timestamp_seconds {_num(snapshot['loaded_at'])}",
+                "# HELP sciscinet_snapshot_load_seconds Time taken to load and index the served snapshot.",
+                "# TYPE sciscinet_snapshot_load_seconds gauge",
+                f"sciscinet_snapshot_load_seconds {_num(snapshot['load_seconds'])}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request until its last body chunk is
+    sent, and counting the body bytes on the wire (compressed if it was).
+    Plain ASGI rather than BaseHTTPMiddleware, so responses are not buffered.
+    """
+
+    def __init__(self, app: Callable, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        status, nbytes = 500, 0
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status, nbytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                nbytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe(
+                getattr(route, "path", "unmatched"),
+                scope["method"],
+                status,
+                time.perf_counter() - t0,
+                nbytes,
+                (scope.get("state") or {}).get(CACHE_STATE),
+            )
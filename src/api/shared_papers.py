@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class SharedPapers:
+    """
+    Per-author paper lists from authors_graph_papers.json (written next to
+    authors_graph.json by the author graph build), indexed once per snapshot
+    so the papers two authors share are one sorted-array intersection.
+    """
+
+    def __init__(self, doc: dict) -> None:
+        self.meta = doc.get("meta", {})
+        papers = doc.get("papers", {})
+        self.paper_ids = sorted(papers)
+        self.papers = [{"id": pid, **papers[pid]} for pid in self.paper_ids]
+        pos = {pid: i for i, pid in enumerate(self.paper_ids)}
+        self.by_author = {
+            str(aid): np.sort(np.asarray([pos[p] for p in plist if p in pos], dtype=np.int64))
+            for aid, plist in doc.get("authors", {}).items()
+        }
+
+    def shared(self, a: str, b: str) -> list[dict]:
+        """Papers of both a and b (doi, year, doctype), in paper id order."""
+        empty = np.zeros(0, dtype=np.int64)
+        both = np.intersect1d(self.by_author.get(a, empty), self.by_author.get(b, empty), assume_unique=True)
+        return [self.papers[i] for i in both.tolist()]
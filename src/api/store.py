@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from fastapi import HTTPException
+
+from src.preprocessing.graph_arrow import GRAPH_OUTPUTS, ArrowGraph, read_graph, read_layout
+from src.preprocessing.snapshots import SNAPSHOTS, current_dir, current_version
+
+from .cache import CachedBody, encode_body
+from .graph_index import GraphIndex
+from .shared_papers import SharedPapers
+
+GRAPH_FILES = set(GRAPH_OUTPUTS)
+# indexed for queries only, never served whole
+SHARED_PAPERS_FILE = "authors_graph_papers.json"
+LAYOUT_DECIMALS = 4  # coordinates on the unit circle; 1e-4 is below a pixel at any usual size
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    path: Path
+    signature: tuple
+    files: dict[str, CachedBody] = field(default_factory=dict)
+    graphs: dict[str, GraphIndex] = field(default_factory=dict)  # by name without .json
+    layouts: dict[str, CachedBody] = field(default_factory=dict)  # by graph name, when the layout stage ran
+    shared_papers: SharedPapers | None = None
+    loaded_at: float = 0.0  # unix time
+    load_seconds: float = 0.0
+
+
+def snapshot_signature(out: Path) -> tuple:
+    version = current_version(out)
+    if version is not None:
+        return ("snapshot", version)
+    # flat (unversioned) outputs: reload when any file changes
+    sig = []
+    for p in sorted(out.glob("*.json")):
+        st = p.stat()
+        sig.append((p.name, st.st_mtime_ns, st.st_size))
+    return ("flat", *sig)
+
+
+def _coords(values) -> list[float]:
+    return np.round(values.to_numpy().astype(np.float64), LAYOUT_DECIMALS).tolist()
+
+
+def layout_document(name: str, g: ArrowGraph, params: dict, nodes, edges) -> dict:
+    """
+    Columnar JSON of a precomputed layout: node ids and positions, and per
+    edge its endpoints (positions into nodes.id) and control points, flat
+    [x0, y0, ..., xk, yk].
+    """
+    points = edges.column("points").combine_chunks()
+    flat = np.round(points.flatten().to_numpy().astype(np.float64), LAYOUT_DECIMALS)
+    return {
+        "meta": {"type": "graph_layout", "graph": name, **params, "nodes": g.num_nodes, "edges": edges.num_rows},
+        "nodes": {
+            "id": g.ids,
+            "x": _coords(nodes.column("x")),
+            "y": _coords(nodes.column("y")),
+            "angle": _coords(nodes.column("angle")),
+        },
+        "edges": {
+            "source": edges.column("source").to_numpy().tolist(),
+            "target": edges.column("target").to_numpy().tolist(),
+            "points": flat.reshape(edges.num_rows, points.type.list_size).tolist(),
+        },
+    }
+
+
+def load_snapshot(out: Path) -> Snapshot:
+    t0 = time.perf_counter()
+    signature = snapshot_signature(out)
+    if signature[0] == "snapshot":
+        version, path = signature[1], out / SNAPSHOTS / signature[1]
+    else:
+        version, path = "flat", current_dir(out)
+
+    files, graphs, layouts, shared = {}, {}, {}, None
+    for p in sorted(path.glob("*.json")):
+        if p.name in GRAPH_FILES:
+            # memory-mapped Arrow tables when the builders wrote them; the JSON
+            # body is generated from them once, here
+            g = read_graph(p)
+            if g is None:
+                g = ArrowGraph.from_dict(json.loads(p.read_bytes()))
+            files[p.name] = encode_body(g.to_dict())
+            graphs[p.stem] = GraphIndex(g)
+            layout = read_layout(p, g)  # None if not built or stale
+            if layout is not None:
+                layouts[p.stem] = encode_body(layout_document(p.stem, g, *layout))
+            continue
+        obj = json.loads(p.read_bytes())
+        if p.name == SHARED_PAPERS_FILE:
+            shared = SharedPapers(obj)
+            continue
+        files[p.name] = encode_body(obj)
+    return Snapshot(
+        version=version,
+        path=path,
+        signature=signature,
+        files=files,
+        graphs=graphs,
+        layouts=layouts,
+        shared_papers=shared,
+        loaded_at=time.time(),
+        load_seconds=time.perf_counter() - t0,
+    )
+
+
+class SnapshotStore:
+    """
+    Holds the live snapshot fully in memory. A background thread polls the
+    CURRENT pointer and, when it moves, loads the new snapshot off the request
+    path and swaps the reference; requests in flight keep the object they
+    already hold, so they never see a mix of old and new files.
+    """
+
+    def __init__(self, out: Path, poll_seconds: float = 2.0) -> None:
+        self.out = out
+        self.poll_seconds = poll_seconds
+        self._snapshot: Snapshot | None = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def current(self) -> Snapshot:
+        snap = self._snapshot
+        if snap is None:
+            self.refresh()
+            snap = self._snapshot
+        return snap
+
+    def refresh(self) -> bool:
+        with self._load_lock:
+            snap = self._snapshot
+            if snap is not None and snap.signature == snapshot_signature(self.out):
+                return False
+            self._snapshot = load_snapshot(self.out)
+            return True
+
+    def get(self, name: str) -> tuple[Snapshot, CachedBody]:
+        snap = self.current()
+        entry = snap.files.get(name)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"File not found: {name} (snapshot {snap.version})")
+        return snap, entry
+
+    def graph(self, name: str) -> GraphIndex:
+        snap = self.current()
+        g = snap.graphs.get(name)
+        if g is None:
+            raise HTTPException(status_code=404, detail=f"Graph not found: {name} (snapshot {snap.version})")
+        return g
+
+    def layout(self, name: str) -> tuple[Snapshot, CachedBody]:
+        snap = self.current()
+        entry = snap.layouts.get(name)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Layout not built: {name} (snapshot {snap.version})")
+        return snap, entry
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as exc:  # keep serving the old snapshot
+                print(f"[WARN] snapshot reload failed: {exc}")
+
+    def start(self) -> None:
+        self.refresh()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Iterator
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from src.preprocessing.graph_arrow import ArrowGraph
+
+from .cache import choose_encoding
+from .metrics import mark_cache
+
+# Graph responses as NDJSON (?format=ndjson, or Accept: application/x-ndjson),
+# streamed in chunks so the client can render while it reads and neither side
+# holds the whole document:
+#
+#   {"meta": {...}, "nodes": N, "edges": M}
+#   N lines, one node object each
+#   M lines, one edge object each (source/target are node ids)
+#
+# Lines are generated from the snapshot's node/edge tables a batch at a time
+# (graph_arrow.BATCH_ROWS) and gzip-compressed on the fly if accepted.
+NDJSON = "application/x-ndjson"
+CHUNK_BYTES = 1 << 16
+
+
+def wants_ndjson(request: Request, format: str) -> bool:
+    return format == "ndjson" or NDJSON in request.headers.get("accept", "")
+
+
+def _line(obj: object) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def ndjson_lines(
+    meta: dict,
+    graph: ArrowGraph,
+    nodes: np.ndarray | None = None,
+    edges: np.ndarray | None = None,
+    ids: list[str] | None = None,
+) -> Iterator[bytes]:
+    """Header line, then the node rows, then the edge rows (all, or the given row numbers)."""
+    n = graph.num_nodes if nodes is None else len(nodes)
+    m = graph.edges.num_rows if edges is None else len(edges)
+    yield _line({"meta": meta, "nodes": n, "edges": m})
+    for row in graph.iter_node_rows(nodes):
+        yield _line(row)
+    for row in graph.iter_edge_rows(edges, ids):
+        yield _line(row)
+
+
+def _chunks(lines: Iterator[bytes], gzip: bool) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits 31: gzip container
+    buf: list[bytes] = []
+    size = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            data = b"".join(buf)
+            buf, size = [], 0
+            data = z.compress(data) if z is not None else data
+            if data:
+                yield data
+    data = b"".join(buf)
+    if z is not None:
+        data = z.compress(data) + z.flush()
+    if data:
+        yield data
+
+
+def ndjson_response(
+    request: Request,
+    meta: dict,
+    graph: ArrowGraph,
+    nodes: np.ndarray | None = None,
+    edges: np.ndarray | None = None,
+    ids: list[str] | None = None,
+    extra_headers: dict | None = None,
+) -> StreamingResponse:
+    mark_cache(request, "miss")
+    gzip = choose_encoding(request, ("gzip", "identity")) == "gzip"
+    headers = {**(extra_headers or {}), "Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _chunks(ndjson_lines(meta, graph, nodes, edges, ids), gzip), media_type=NDJSON, headers=headers
+    )
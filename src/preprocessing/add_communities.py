@@ -1,102 +1,89 @@
-import json
+import sys
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-
-import networkx as nx
-from networkx.algorithms.community import greedy_modularity_communities
+from typing import Dict, Any, Tuple
 
+import numpy as np
 
+THIS_DIR = Path(__file__).resolve().parent
 REPO_ROOT = Path(__file__).resolve().parents[2]
 OUT = REPO_ROOT / "data" / "outputs"
+CACHE = REPO_ROOT / "data" / "cache"
 
+sys.path.insert(0, str(THIS_DIR))
 
-def read_json(path: Path) -> Dict[str, Any]:
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
-def write_json(path: Path, obj: Dict[str, Any]) -> None:
-    path.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
-
+from utils import load_config, write_output
+from snapshots import building, current_dir
+from communities import detect
+from graph_arrow import ArrowGraph, load_graph
+from instrument import attach, record_run, stage, step, trace_enabled
 
-def build_undirected_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> nx.Graph:
-    """
-    Build an undirected graph for community detection.
-    For citation networks (directed in meaning), we still use undirected modularity to get clusters.
-    """
-    G = nx.Graph()
-    for n in nodes:
-        G.add_node(n["id"])
 
-    for e in edges:
-        s = e.get("source")
-        t = e.get("target")
-        if s is None or t is None:
-            continue
-        if s == t:
-            continue
-        if G.has_node(s) and G.has_node(t):
-            G.add_edge(s, t)
+def edge_weights(graph: ArrowGraph) -> np.ndarray:
+    """Edge weights as floats; edges without a "weight" count 1."""
+    if "weight" not in graph.edges.column_names:
+        return np.ones(graph.edges.num_rows)
+    return graph.edges.column("weight").fill_null(1).to_numpy().astype(np.float64)
 
-    return G
 
-
-def compute_communities(G: nx.Graph) -> Dict[str, int]:
+def add_fields(
+    graph: Dict[str, Any] | ArrowGraph, engine: str = "louvain", seed: int = 42, resolution: float = 1.0
+) -> ArrowGraph:
     """
-    Returns: node_id -> community_id
+    Adds community and degree node columns and meta.communities. Works on
+    the columnar graph (a JSON object is converted first): edge endpoints are
+    already node positions, so nothing is looked up per edge. Citation edges
+    (directed in meaning) are treated as undirected to get clusters.
     """
-    if G.number_of_nodes() == 0:
-        return {}
-
-    if G.number_of_edges() == 0:
-        return {str(n): 0 for n in G.nodes()}
-
-    comms = list(greedy_modularity_communities(G))
-
-    comms.sort(key=lambda c: len(c), reverse=True)
-
-    node2comm: Dict[str, int] = {}
-    for cid, cset in enumerate(comms):
-        for nid in cset:
-            node2comm[str(nid)] = cid
-
-    for nid in G.nodes():
-        node2comm.setdefault(str(nid), -1)
-
-    return node2comm
-
-
-def add_fields(graph: Dict[str, Any]) -> Dict[str, Any]:
-    nodes = graph.get("nodes", [])
-    edges = graph.get("edges", [])
+    g = graph if isinstance(graph, ArrowGraph) else ArrowGraph.from_dict(graph)
 
-    G = build_undirected_graph(nodes, edges)
-    node2comm = compute_communities(G)
+    with step("communities", rows_in=g.edges.num_rows) as span:
+        t0 = time.perf_counter()
+        src, dst = g.positions()
+        comm, deg, stats = detect(g.num_nodes, src, dst, edge_weights(g), engine=engine, seed=seed, resolution=resolution)
+        stats["seconds"] = round(time.perf_counter() - t0, 4)
+        span.rows(rows_out=g.num_nodes)
 
-    deg = dict(G.degree())
+    columns = {"community": comm.astype(np.int64), "degree": deg.astype(np.int64)}
+    return g.with_node_columns(columns, {**g.meta, "communities": stats})
 
-    for n in nodes:
-        nid = str(n["id"])
-        n["community"] = int(node2comm.get(nid, -1))
-        n["degree"] = int(deg.get(nid, 0))
 
-    graph["nodes"] = nodes
-    graph["edges"] = edges
-    return graph
+def community_params(cfg: Dict[str, Any]) -> Tuple[str, int, float]:
+    c = cfg.get("communities") or {}
+    return c.get("engine", "louvain"), int(c.get("seed", 42)), float(c.get("resolution", 1.0))
 
 
 def main():
-    for name in ["papers_graph.json", "authors_graph.json"]:
-        in_path = OUT / name
-        if not in_path.exists():
-            print(f"[skip] not found: {in_path}")
-            continue
-
-        graph = read_json(in_path)
-        graph2 = add_fields(graph)
-
-        out_path = OUT / name 
-        write_json(out_path, graph2)
-        print(f"[ok] wrote community+degree into: {out_path}")
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    engine, seed, resolution = community_params(cfg)
+
+    src_dir = current_dir(OUT)
+    spans: Dict[str, Dict[str, Any]] = {}
+
+    with building(OUT) as snap:
+        for name in ["papers_graph.json", "authors_graph.json"]:
+            in_path = src_dir / name
+            if not in_path.exists():
+                print(f"[skip] not found: {in_path}")
+                continue
+
+            # same stage names as the pipeline (papers_communities, authors_communities)
+            with stage(name.replace("_graph.json", "_communities"), trace_enabled(cfg)) as span:
+                graph = load_graph(in_path)  # memory-mapped Arrow files when present
+                graph2 = add_fields(graph, engine, seed, resolution)
+            attach({name: graph2}, span)
+            spans[span.name] = span.to_dict()
+            stats = graph2.meta["communities"]
+
+            out_path = snap / name
+            write_output(graph2, out_path)  # Arrow files + JSON streamed from them
+            print(
+                f"[ok] wrote community+degree into: {out_path} | engine={engine} "
+                f"communities={stats['communities']} modularity={stats['modularity']} seconds={stats['seconds']}"
+            )
+
+    if spans:
+        record_run(CACHE, "add_communities", spans, snapshot=snap.name)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import load_config
+from cohort import Cohort, load_cohorts
+from tables import scan_table, read_parquet
+from pipeline import STAGES, Context, Stage, plan_pipeline, run_pipeline
+
+RAW = REPO_ROOT / "data" / "raw"
+OUT = REPO_ROOT / "data" / "outputs"
+CACHE = REPO_ROOT / "data" / "cache"
+BATCH_OUT = OUT / "cohorts"
+
+# Batch mode: config.yaml may list several cohort definitions under
+# `cohorts`. Each entry has a `name` and overrides top-level keys (mapping
+# sections such as paper_graph are merged key by key). All cohorts are cut
+# from one filtered scan per raw table, and each gets its own output root
+#
+#   data/outputs/cohorts/<name>/{CURRENT,snapshots/<version>/*.json}
+#
+# with the same incremental rebuild as pipeline.py, so adding a cohort only
+# builds that cohort.
+
+NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def cohort_configs(cfg: dict) -> list[tuple[str, dict]]:
+    base = {k: v for k, v in cfg.items() if k != "cohorts"}
+    out: list[tuple[str, dict]] = []
+    for entry in cfg.get("cohorts") or []:
+        name = str(entry.get("name", ""))
+        if not NAME_RE.match(name):
+            raise ValueError(f"cohort name must match {NAME_RE.pattern}: {name!r}")
+        if any(name == n for n, _ in out):
+            raise ValueError(f"duplicate cohort name: {name!r}")
+
+        merged = dict(base)
+        for key, value in entry.items():
+            if key == "name":
+                continue
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = {**merged[key], **value}
+            else:
+                merged[key] = value
+        out.append((name, merged))
+    return out
+
+
+def _window_papers(cohorts: list[Cohort], cfgs: list[dict]) -> np.ndarray:
+    ids = [c.paper_ids(int(cfg["year_from"]), int(cfg["year_to"])) for c, cfg in zip(cohorts, cfgs)]
+    return np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+
+
+def shared_inputs(todo: dict[str, list[Stage]], cohorts: dict[str, Cohort], cfgs: dict[str, dict], raw: Path) -> dict:
+    """
+    Raw tables the graph stages would each scan, scanned once for all cohorts
+    that rebuild them (filtered to the union of their T1 papers).
+    """
+    shared: dict = {}
+    need_papers = [n for n, stages in todo.items() if any(s.name == "papers_graph" for s in stages)]
+    need_authors = [n for n, stages in todo.items() if any(s.name == "authors_graph" for s in stages)]
+
+    if need_papers:
+        ids = _window_papers([cohorts[n] for n in need_papers], [cfgs[n] for n in need_papers])
+        shared["refs"] = scan_table(
+            raw / "sciscinet_paperrefs.parquet",
+            ["citing_paperid", "cited_paperid"],
+            [("citing_paperid", "in", ids), ("cited_paperid", "in", ids)],
+            int_ids=["citing_paperid", "cited_paperid"],
+        )
+    if need_authors:
+        ids = _window_papers([cohorts[n] for n in need_authors], [cfgs[n] for n in need_authors])
+        shared["author_papers"] = read_parquet(
+            raw / "sciscinet_authors_paperid.parquet",
+            ["authorid", "paperid"],
+            [("paperid", "in", ids)],
+            int_ids=["authorid", "paperid"],
+        )
+    return shared
+
+
+def run_batch(
+    cfg: dict,
+    raw: Path = RAW,
+    cache: Path = CACHE,
+    out: Path = BATCH_OUT,
+    names: set[str] | None = None,
+    force: bool = False,
+    dry_run: bool = False,
+) -> dict[str, list[str]]:
+    """Runs the stale stages of every (or every named) cohort; returns the stages run per cohort."""
+    cfgs = dict(cohort_configs(cfg))
+    if names:
+        unknown = names - set(cfgs)
+        if unknown:
+            raise ValueError(f"unknown cohort(s): {', '.join(sorted(unknown))}")
+        cfgs = {n: c for n, c in cfgs.items() if n in names}
+
+    forced = {s.name for s in STAGES} if force else None
+    todo: dict[str, list[Stage]] = {}
+    for name, ccfg in cfgs.items():
+        _, _, stages = plan_pipeline(ccfg, raw, out / name, cache / f"pipeline-{name}.json", forced)
+        if stages:
+            todo[name] = stages
+
+    if dry_run or not todo:
+        for name in cfgs:
+            plan = ", ".join(s.name for s in todo.get(name, [])) or "up to date"
+            print(f"[plan] {name}: {plan}")
+        return {name: [s.name for s in stages] for name, stages in todo.items()}
+
+    needs_cohort = [n for n, stages in todo.items() if any(s.uses_cohort for s in stages)]
+    cohorts = dict(zip(needs_cohort, load_cohorts([cfgs[n] for n in needs_cohort], raw, cache)))
+    shared = shared_inputs(todo, cohorts, cfgs, raw)
+
+    ran: dict[str, list[str]] = {}
+    for name in todo:
+        print(f"== cohort {name}")
+        ccfg = cfgs[name]
+        ctx = Context(ccfg, raw, cache, out / name, cohort=cohorts.get(name), shared=shared)
+        ran[name] = run_pipeline(
+            ccfg,
+            raw,
+            cache,
+            out / name,
+            force=forced,
+            manifest_path=cache / f"pipeline-{name}.json",
+            ctx=ctx,
+        )
+    return ran
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    if not cfg.get("cohorts"):
+        print("[ERROR] no `cohorts` list in configs/config.yaml")
+        sys.exit(2)
+
+    names = {a for a in args if not a.startswith("--")}
+    run_batch(cfg, names=names or None, force="--force" in args, dry_run="--dry-run" in args)
+
+
+if __name__ == "__main__":
+    main()
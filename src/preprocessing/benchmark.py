@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import load_config, write_json, write_output
+from synth_tables import BENCH, SCALES, ensure_tables
+
+RESULTS = BENCH / "results"
+RESULTS_VERSION = 1
+
+# Offline benchmark: for each scale, generate synthetic tables (synth_tables.py)
+# under data/bench/<scale>/ and time every build step and API endpoint on
+# them. Each build step runs in a fresh process, so its peak RSS is its own:
+#
+#   [ingest, catalog, indexes]   with --local
+#   cohort, papers_graph, papers_communities, authors_graph,
+#   authors_communities, t2_dashboards
+#   api                          snapshot load + N requests per endpoint
+#
+# Results go to data/bench/results/<time>.json. With --baseline FILE, steps
+# slower (or heavier) than the baseline by more than --tolerance are listed
+# and the exit code is 1, so regressions show up without the real data.
+STEPS = ["cohort", "papers_graph", "papers_communities", "authors_graph", "authors_communities", "t2_dashboards"]
+LOCAL_STEPS = ["ingest", "catalog", "indexes"]
+
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_MB = 8.0
+
+
+def scale_dirs(root: Path) -> dict[str, Path]:
+    return {
+        "raw": root / "raw",
+        "cache": root / "cache",
+        "out": root / "outputs",
+    }
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_step(step: str, root: Path, cfg: dict) -> None:
+    d = scale_dirs(root)
+    raw, cache, out = d["raw"], d["cache"], d["out"]
+
+    if step == "ingest":
+        from ingest_tables import SORT_KEYS, ingest
+        from tables import local_path
+
+        for fname, keys in SORT_KEYS.items():
+            ingest(raw / fname, keys, local_path(raw / fname))
+    elif step == "catalog":
+        from catalog import CATALOG_VERSION, catalog_path
+        from schema_probe_parquet import FILES, table_entry
+
+        tables = {fname: table_entry(raw / fname) for fname in FILES}
+        write_json({"version": CATALOG_VERSION, "tables": tables}, catalog_path(raw / FILES[0]))
+    elif step == "indexes":
+        from build_indexes import build_index
+        from inverted_index import INDEXES
+
+        for name in INDEXES:
+            build_index(name, raw)
+    elif step == "cohort":
+        from cohort import load_cohort
+
+        load_cohort(cfg, raw, cache, rebuild=True)
+    else:
+        from pipeline import STAGES, Context
+        from snapshots import building
+
+        stage = {s.name: s for s in STAGES}[step]
+        ctx = Context(cfg, raw, cache, out)
+        results = stage.run(ctx)
+        with building(out) as snap:
+            for name, obj in results.items():
+                write_output(obj, snap / name)
+
+
+def measure_step(step: str, root: Path, cfg: dict, trace: bool) -> dict:
+    """Runs one step in this (fresh) process and returns its seconds and memory peaks."""
+    import pyarrow as pa
+
+    base_mb = _rss_mb()
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    _run_step(step, root, cfg)
+    seconds = time.perf_counter() - t0
+    result = {
+        "seconds": round(seconds, 4),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "base_rss_mb": round(base_mb, 1),
+        "arrow_peak_mb": round(pa.default_memory_pool().max_memory() / (1 << 20), 1),
+    }
+    if trace:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+        tracemalloc.stop()
+    return result
+
+
+def api_requests(store) -> dict[str, str]:
+    """Endpoint name -> URL, with query parameters picked from the loaded graphs."""
+    snap = store.current()
+    urls = {
+        "papers_graph": "/api/papers_graph",
+        "authors_graph": "/api/authors_graph",
+        "t2_timeline": "/api/t2_timeline",
+        "t2_patent_counts_by_year": "/api/t2_patent_counts_by_year",
+    }
+    for name, g in snap.graphs.items():
+        if g.num_nodes == 0:
+            continue
+        hub = g.ids[int(np.argmax(g.degree))]
+        urls[f"{name}/ego"] = f"/api/{name}/ego?node={hub}&hops=2"
+        urls[f"{name}/subgraph"] = f"/api/{name}/subgraph?min_degree=2"
+    g = snap.graphs.get("authors_graph")
+    if g is not None and len(g.src):
+        k = int(np.argmax(g.weight))
+        a, b = g.ids[g.src[k]], g.ids[g.dst[k]]
+        urls["authors_graph/shared_papers"] = f"/api/authors_graph/shared_papers?a={a}&b={b}"
+    return urls
+
+
+def measure_api(root: Path, n_requests: int) -> dict:
+    """Snapshot load time/RSS and per-endpoint latency percentiles, in this (fresh) process."""
+    sys.path.insert(0, str(REPO_ROOT))
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError as exc:  # TestClient needs httpx
+        return {"skipped": str(exc)}
+    import src.api.main as api
+    from src.api.store import SnapshotStore
+
+    base_mb = _rss_mb()
+    t0 = time.perf_counter()
+    api.store = SnapshotStore(scale_dirs(root)["out"])
+    api.store.refresh()
+    result: dict = {
+        "load": {"seconds": round(time.perf_counter() - t0, 4), "rss_mb": round(_rss_mb() - base_mb, 1)},
+    }
+    with TestClient(api.app) as client:
+        for name, url in api_requests(api.store).items():
+            client.get(url)  # warm-up
+            ms, size = [], 0
+            for _ in range(n_requests):
+                t0 = time.perf_counter()
+                r = client.get(url)
+                ms.append((time.perf_counter() - t0) * 1000)
+                size = int(r.headers.get("content-length", len(r.content)))
+            result[name] = {
+                "status": r.status_code,
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "bytes": size,
+            }
+    return result
+
+
+def in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_scale(scale: str, cfg: dict, local: bool, repeat: int, n_requests: int, trace: bool) -> dict:
+    root = BENCH / scale
+    n = SCALES[scale] if scale in SCALES else int(scale)
+    t0 = time.perf_counter()
+    info = ensure_tables(scale_dirs(root)["raw"], n, cfg)
+    print(f"== {scale}: {n} papers (tables ready in {time.perf_counter() - t0:.1f}s)")
+
+    if not local:
+        # measure reads of the raw files, not copies/indexes left by a --local run
+        for sub in ("local", "index"):
+            shutil.rmtree(root / sub, ignore_errors=True)
+        (root / "cache" / "catalog.json").unlink(missing_ok=True)
+
+    steps: dict[str, dict] = {}
+    for step in (LOCAL_STEPS if local else []) + STEPS:
+        runs = [in_fresh_process(measure_step, step, root, cfg, trace) for _ in range(max(1, repeat))]
+        steps[step] = min(runs, key=lambda r: r["seconds"])
+        print(f"  {step:<20} {steps[step]['seconds']:>9.3f}s  peak_rss={steps[step]['peak_rss_mb']:.0f}MB")
+
+    api = in_fresh_process(measure_api, root, n_requests)
+    if "skipped" in api:
+        print(f"  api skipped: {api['skipped']}")
+    else:
+        print(f"  {'api load':<20} {api['load']['seconds']:>9.3f}s  rss=+{api['load']['rss_mb']:.0f}MB")
+        for name, r in api.items():
+            if name != "load":
+                print(f"  {name:<32} p50={r['p50_ms']:.2f}ms p95={r['p95_ms']:.2f}ms bytes={r['bytes']}")
+    return {"papers": n, "rows": info["rows"], "local": local, "steps": steps, "api": api}
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Human-readable lines for every metric worse than baseline by more than tolerance."""
+    out = []
+
+    def check(label: str, new: float | None, old: float | None, floor: float) -> None:
+        if new is None or old is None:
+            return
+        if new > old * (1 + tolerance) and new - old > floor:
+            out.append(f"{label}: {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+
+    for scale, cur in current["scales"].items():
+        old = baseline.get("scales", {}).get(scale)
+        if old is None:
+            continue
+        for step, r in cur["steps"].items():
+            o = old["steps"].get(step, {})
+            check(f"{scale}/{step} seconds", r["seconds"], o.get("seconds"), MIN_SECONDS)
+            check(f"{scale}/{step} peak_rss_mb", r["peak_rss_mb"], o.get("peak_rss_mb"), MIN_MB)
+        for name, r in cur["api"].items():
+            o = old.get("api", {}).get(name, {})
+            if name == "load":
+                check(f"{scale}/api load seconds", r["seconds"], o.get("seconds"), MIN_SECONDS)
+            elif isinstance(r, dict):
+                check(f"{scale}/api {name} p95_ms", r.get("p95_ms"), o.get("p95_ms"), 1.0)
+    return out
+
+
+def option(args: list[str], name: str, default: str | None = None) -> str | None:
+    if name in args:
+        i = args.index(name)
+        if i + 1 < len(args):
+            return args[i + 1]
+    return default
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    values = {option(args, o) for o in ("--repeat", "--requests", "--baseline", "--tolerance")}
+    scales = [a for a in args if not a.startswith("--") and a not in values] or ["tiny"]
+    unknown = [s for s in scales if s not in SCALES and not s.isdigit()]
+    if unknown:
+        print(f"[ERROR] unknown scale(s): {', '.join(unknown)}; known: {', '.join(SCALES)} or a paper count")
+        sys.exit(2)
+
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    cfg.pop("cohorts", None)
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "scales": {},
+    }
+    for scale in scales:
+        report["scales"][scale] = run_scale(
+            scale,
+            cfg,
+            local="--local" in args,
+            repeat=int(option(args, "--repeat", "1")),
+            n_requests=int(option(args, "--requests", "20")),
+            trace="--tracemalloc" in args,
+        )
+
+    out = RESULTS / f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.json"
+    write_json(report, out)
+    print(f"[OK] results: {out}")
+
+    baseline = option(args, "--baseline")
+    if baseline:
+        worse = regressions(report, json.loads(Path(baseline).read_text(encoding="utf-8")), float(option(args, "--tolerance", "0.25")))
+        for line in worse:
+            print(f"[REGRESSION] {line}")
+        if worse:
+            sys.exit(1)
+        print("[OK] no regressions against", baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,9 @@ from __future__ import annotations
 
 import sys
 import re
-import itertools
 from pathlib import Path
-from collections import defaultdict
 
+import numpy as np
 import pandas as pd
 
 THIS_DIR = Path(__file__).resolve().parent
@@ -21,148 +20,163 @@ def find_repo_root(start: Path) -> Path:
 REPO_ROOT = find_repo_root(THIS_DIR)
 sys.path.insert(0, str(THIS_DIR))
 
-from utils import load_config, compile_keywords, write_json
+from utils import load_config, compile_keywords, write_output
+from snapshots import building
+from cohort import Cohort, load_cohort
+from tables import read_parquet
+from coauthor import coauthor_edges, paper_groups, prune_edges
+from graph_arrow import ArrowGraph, node_positions
+from instrument import attach, record_run, stage, step, trace_enabled
 
 RAW = REPO_ROOT / "data" / "raw"
 OUT = REPO_ROOT / "data" / "outputs"
+CACHE = REPO_ROOT / "data" / "cache"
 
 
-def norm_pair(a: str, b: str) -> tuple[str, str]:
-    return (a, b) if a < b else (b, a)
+AUTHOR_COLUMNS = ["authorid", "display_name", "h_index", "productivity"]
 
 
-def main() -> None:
-    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+def author_info(raw: Path, ids: np.ndarray, authors: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    AUTHOR_COLUMNS rows for ids, in the order of ids, plus `found` (False
+    where the authors table has no row). Only the rows for ids are read
+    (pushed-down "in" filter), so cost follows the graph size, not the table.
+    """
+    if authors is None:
+        authors = read_parquet(
+            raw / "sciscinet_authors.parquet",
+            AUTHOR_COLUMNS,
+            [("authorid", "in", np.sort(ids))],
+            int_ids=["authorid"],
+        )
+    rows = authors[authors["authorid"].isin(ids)].drop_duplicates("authorid").set_index("authorid")
+    info = rows.reindex(ids)
+    info["found"] = np.isin(ids, rows.index.to_numpy())
+    return info
+
+
+def graph_papers(
+    cohort: Cohort,
+    ap: pd.DataFrame,
+    top_ids: np.ndarray,
+    max_authors: int,
+    year_range: tuple[int, int],
+) -> dict:
+    """
+    Evidence behind the author graph: for each node, the papers it shares
+    with at least one other node (counted the same way as edge weights, so
+    the papers two authors have in common number exactly their edge weight),
+    plus doi/year/doctype of those papers. Served by the API's
+    shared-papers endpoint.
+    """
+    p, a, _, _ = paper_groups(ap["paperid"].to_numpy(), ap["authorid"].to_numpy(), max_authors)
+    inside = np.isin(a, np.sort(top_ids))
+    p, a = p[inside], a[inside]
+    pids, counts = np.unique(p, return_counts=True)
+    shared = np.isin(p, pids[counts >= 2])
+    p, a = p[shared], a[shared]
+
+    order = np.lexsort((p, a))
+    p, a = p[order], a[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]]) if len(a) else np.zeros(0, dtype=np.int64)
+    bounds = np.r_[starts, len(a)]
+
+    aid_codec, pid_codec = cohort.codec("authorid"), cohort.codec("paperid")
+    p_str = pid_codec.decode(p)
+    authors = {
+        aid: p_str[lo:hi]
+        for aid, lo, hi in zip(aid_codec.decode(a[starts]), bounds[:-1].tolist(), bounds[1:].tolist())
+    }
+
+    rows = cohort.papers[cohort.papers["paperid"].isin(np.unique(p))].drop_duplicates("paperid")
+    rows = rows.sort_values("paperid")
+    papers = {
+        pid: {
+            "doi": doi if isinstance(doi, str) and doi else None,
+            "year": int(year) if pd.notna(year) else None,
+            "doctype": doctype if isinstance(doctype, str) else "",
+        }
+        for pid, doi, year, doctype in zip(
+            pid_codec.decode(rows["paperid"]), rows["doi"].tolist(), rows["year"].tolist(), rows["doctype"].tolist()
+        )
+    }
 
+    return {
+        "meta": {
+            "type": "author_graph_papers",
+            "year_range": list(year_range),
+            "max_authors_per_paper": max_authors,
+            "authors": len(authors),
+            "papers": len(papers),
+        },
+        "papers": papers,
+        "authors": authors,
+    }
+
+
+def build_outputs(
+    cfg: dict,
+    cohort: Cohort,
+    raw: Path = RAW,
+    author_papers: pd.DataFrame | None = None,
+    authors: pd.DataFrame | None = None,
+) -> dict[str, dict | ArrowGraph]:
+    """
+    authors_graph.json (columnar, see graph_arrow.py) and its evidence file authors_graph_papers.json.
+    author_papers (authorid, paperid) and authors may be passed in already
+    read (a superset is fine, e.g. shared by several cohorts in batch mode);
+    otherwise they are read from raw.
+    """
     year_from, year_to = int(cfg["year_from"]), int(cfg["year_to"])
     uni_pat = compile_keywords(cfg["university_keywords"])
-    field_pat = compile_keywords(cfg["field_keywords"])
     whitelist = set(cfg.get("institution_whitelist", []))
 
     max_nodes = int(cfg["author_graph"]["max_nodes"])
     min_w = int(cfg["author_graph"]["min_edge_weight"])
     strongest_k = int(cfg["author_graph"]["strongest_k"])
+    max_authors = int(cfg["author_graph"].get("max_authors_per_paper", 0) or 0)
+
+    final_papers = cohort.paper_ids(year_from, year_to)
+
+    with step("author_papers") as span:
+        if author_papers is None:
+            ap = read_parquet(
+                raw / "sciscinet_authors_paperid.parquet",
+                ["authorid", "paperid"],
+                [("paperid", "in", final_papers)],
+                int_ids=["authorid", "paperid"],
+            )
+        else:
+            ap = author_papers[author_papers["paperid"].isin(final_papers)]
+        span.rows(rows_in=len(final_papers), rows_out=len(ap))
+
+    with step("coauthor_edges", rows_in=len(ap)) as span:
+        src, dst, weight = coauthor_edges(
+            ap["paperid"].to_numpy(),
+            ap["authorid"].to_numpy(),
+            max_authors=max_authors,
+        )
+        span.rows(rows_out=len(src))
+    with step("prune_edges", rows_in=len(src)) as span:
+        (src, dst, weight), (top_ids, deg, wdeg) = prune_edges(
+            src, dst, weight, min_w, strongest_k, max_nodes
+        )
+        span.rows(rows_out=len(src))
+
+    with step("author_info", rows_in=len(top_ids)) as span:
+        info = author_info(raw, top_ids, authors)
+        span.rows(rows_out=int(info["found"].sum()))
+
+    with step("institutions"):
+        paai = cohort.paa[cohort.paa["paperid"].isin(final_papers)]
+        paai = paai[paai["authorid"].isin(top_ids)]
+        paai = paai.merge(cohort.institutions, on="institutionid", how="left")
+
+        inst = paai[["authorid", "institution_name"]].dropna()
+        inst = inst.astype({"institution_name": str}).drop_duplicates().sort_values(["authorid", "institution_name"])
+        author_insts: dict[int, list[str]] = inst.groupby("authorid")["institution_name"].agg(list).to_dict()
 
-    papers = pd.read_parquet(
-        RAW / "sciscinet_papers.parquet",
-        columns=["paperid", "year", "doctype", "doi"],
-    )
-    papers["paperid"] = papers["paperid"].astype(str)
-
-    papers = papers[(papers["year"] >= year_from) & (papers["year"] <= year_to)]
-
-    dt_white = set(cfg.get("doctype_whitelist", []))
-    if dt_white:
-        papers["doctype"] = papers["doctype"].fillna("").astype(str)
-        papers = papers[papers["doctype"].isin(dt_white)]
-
-    doi_blacklist = cfg.get("doi_blacklist_regex", [])
-    if doi_blacklist:
-        doi_series = papers["doi"].fillna("").astype(str)
-        bad = pd.Series(False, index=papers.index)
-        for pat in doi_blacklist:
-            bad = bad | doi_series.str.contains(pat, regex=True)
-        papers = papers[~bad]
-
-    year_papers = set(papers["paperid"])
-
-    fields = pd.read_parquet(RAW / "sciscinet_fields.parquet", columns=["fieldid", "display_name"])
-    cs_fields = fields[fields["display_name"].fillna("").str.contains(field_pat)]
-    cs_fieldids = set(cs_fields["fieldid"].astype(str))
-
-    pf = pd.read_parquet(RAW / "sciscinet_paperfields.parquet", columns=["paperid", "fieldid"])
-    pf["paperid"] = pf["paperid"].astype(str)
-    pf["fieldid"] = pf["fieldid"].astype(str)
-    cs_papers = set(pf.loc[pf["fieldid"].isin(cs_fieldids), "paperid"])
-
-    aff = pd.read_parquet(RAW / "sciscinet_affiliations.parquet", columns=["institution_id", "display_name"])
-    dart_aff = aff[aff["display_name"].fillna("").str.contains(uni_pat)]
-    if whitelist:
-        dart_aff = dart_aff[dart_aff["display_name"].isin(whitelist)]
-    dart_inst_ids = set(dart_aff["institution_id"].astype(str))
-
-    paa = pd.read_parquet(
-        RAW / "sciscinet_paper_author_affiliation.parquet",
-        columns=["paperid", "authorid", "institutionid"],
-    )
-    paa["paperid"] = paa["paperid"].astype(str)
-    paa["authorid"] = paa["authorid"].astype(str)
-    paa["institutionid"] = paa["institutionid"].astype(str)
-
-    dart_papers = set(paa.loc[paa["institutionid"].isin(dart_inst_ids), "paperid"])
-
-    final_papers = year_papers & cs_papers & dart_papers
-
-    ap = pd.read_parquet(RAW / "sciscinet_authors_paperid.parquet", columns=["authorid", "paperid"])
-    ap["paperid"] = ap["paperid"].astype(str)
-    ap["authorid"] = ap["authorid"].astype(str)
-    ap = ap[ap["paperid"].isin(final_papers)]
-
-    by_paper = ap.groupby("paperid")["authorid"].apply(list)
-
-    edge_w: dict[tuple[str, str], int] = defaultdict(int)
-    for authors in by_paper:
-        uniq = sorted(set(authors))
-        if len(uniq) < 2:
-            continue
-        for a, b in itertools.combinations(uniq, 2):
-            edge_w[norm_pair(a, b)] += 1
-
-    edges = [
-        {"source": a, "target": b, "weight": int(w)}
-        for (a, b), w in edge_w.items()
-        if w >= min_w
-    ]
-
-    by_node: dict[str, list[dict]] = defaultdict(list)
-    for e in edges:
-        by_node[e["source"]].append(e)
-        by_node[e["target"]].append(e)
-
-    keep_pairs: set[tuple[str, str]] = set()
-    for node, es in by_node.items():
-        es_sorted = sorted(es, key=lambda x: (-x["weight"], x["source"], x["target"]))
-        for e in es_sorted[:strongest_k]:
-            keep_pairs.add(norm_pair(e["source"], e["target"]))
-
-    edges = [e for e in edges if norm_pair(e["source"], e["target"]) in keep_pairs]
-
-    deg: dict[str, int] = defaultdict(int)
-    wdeg: dict[str, int] = defaultdict(int)
-    for e in edges:
-        s, t, w = e["source"], e["target"], int(e["weight"])
-        deg[s] += 1
-        deg[t] += 1
-        wdeg[s] += w
-        wdeg[t] += w
-
-    top_nodes = [a for a, _ in sorted(wdeg.items(), key=lambda x: -x[1])[:max_nodes]]
-    top_set = set(top_nodes)
-
-    edges = [e for e in edges if e["source"] in top_set and e["target"] in top_set]
-
-
-    authors = pd.read_parquet(
-        RAW / "sciscinet_authors.parquet",
-        columns=["authorid", "display_name", "h_index", "productivity"],
-    )
-    authors["authorid"] = authors["authorid"].astype(str)
-    aid2 = authors.set_index("authorid").to_dict(orient="index")
-
-    inst_name = aff.copy()
-    inst_name["institution_id"] = inst_name["institution_id"].astype(str)
-    inst_name = inst_name.rename(columns={"institution_id": "institutionid", "display_name": "institution_name"})
-
-    paai = paa[paa["paperid"].isin(final_papers)].copy()
-    paai = paai[paai["authorid"].isin(top_set)]
-    paai = paai.merge(inst_name, on="institutionid", how="left")
-
-    author_insts: dict[str, list[str]] = defaultdict(list)
-    for aid, sub in paai.groupby("authorid"):
-        names = sub["institution_name"].dropna().astype(str).unique().tolist()
-        author_insts[aid] = sorted(names)
-
-    def is_dartmouth_author(aid: str) -> bool:
+    def is_dartmouth_author(aid: int) -> bool:
         insts = author_insts.get(aid, [])
         if not insts:
             return False
@@ -171,42 +185,69 @@ def main() -> None:
         s = " | ".join(insts)
         return re.search(uni_pat, s, flags=re.IGNORECASE) is not None
 
-    nodes = []
-    for a in top_nodes:
-        info = aid2.get(a, {})
-        h = info.get("h_index", None)
-        p = info.get("productivity", None)
-
-        nodes.append(
-            {
-                "id": a,
-                "name": info.get("display_name", ""),
-                "h_index": int(h) if h is not None and pd.notna(h) else None,
-                "productivity": int(p) if p is not None and pd.notna(p) else None,
-                "institutions": author_insts.get(a, []),
-                "is_dartmouth": bool(is_dartmouth_author(a)),
-                "degree": int(deg.get(a, 0)),
-                "weighted_degree": int(wdeg.get(a, 0)),
-            }
+    aid_codec = cohort.codec("authorid")
+
+    meta = {
+        "type": "author_collaboration_graph",
+        "year_range": [year_from, year_to],
+        "field": cfg["field_keywords"],
+        "institutions": list(whitelist),
+        "min_edge_weight": min_w,
+        "strongest_k": strongest_k,
+        "max_nodes": max_nodes,
+        "max_authors_per_paper": max_authors,
+    }
+    with step("assemble"):
+        ids = top_ids.tolist()
+        nodes = {
+            "id": aid_codec.decode(top_ids),
+            "name": info["display_name"].where(info["found"], ""),
+            "h_index": pd.to_numeric(info["h_index"]).round().astype("Int64"),
+            "productivity": pd.to_numeric(info["productivity"]).round().astype("Int64"),
+            "institutions": [author_insts.get(a, []) for a in ids],
+            "is_dartmouth": [bool(is_dartmouth_author(a)) for a in ids],
+            "degree": deg.astype(np.int64),
+            "weighted_degree": wdeg.astype(np.int64),
+        }
+        graph = ArrowGraph.from_columns(
+            meta,
+            nodes,
+            node_positions(top_ids, src),
+            node_positions(top_ids, dst),
+            {"weight": weight.astype(np.int64)},
         )
-
-    graph = {
-        "meta": {
-            "type": "author_collaboration_graph",
-            "year_range": [year_from, year_to],
-            "field": cfg["field_keywords"],
-            "institutions": list(whitelist),
-            "min_edge_weight": min_w,
-            "strongest_k": strongest_k,
-            "max_nodes": max_nodes,
-        },
-        "nodes": nodes,
-        "edges": edges,
+    with step("evidence"):
+        evidence = graph_papers(cohort, ap, top_ids, max_authors, (year_from, year_to))
+    return {
+        "authors_graph.json": graph,
+        "authors_graph_papers.json": evidence,
     }
 
-    OUT.mkdir(parents=True, exist_ok=True)
-    write_json(graph, OUT / "authors_graph.json")
-    print(f"[OK] authors_graph.json | nodes={len(nodes)} edges={len(edges)}")
+
+def build_graph(
+    cfg: dict,
+    cohort: Cohort,
+    raw: Path = RAW,
+    author_papers: pd.DataFrame | None = None,
+    authors: pd.DataFrame | None = None,
+) -> ArrowGraph:
+    return build_outputs(cfg, cohort, raw, author_papers, authors)["authors_graph.json"]
+
+
+def main() -> None:
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    with stage("authors_graph", trace_enabled(cfg)) as span:
+        with step("cohort"):
+            cohort = load_cohort(cfg, RAW, CACHE)
+        outputs = build_outputs(cfg, cohort)
+    attach(outputs, span)
+    graph = outputs["authors_graph.json"]
+
+    with building(OUT) as snap:
+        for name, obj in outputs.items():
+            write_output(obj, snap / name)
+    record_run(CACHE, "build_author_graph", {span.name: span.to_dict()}, snapshot=snap.name)
+    print(f"[OK] authors_graph.json | nodes={graph.num_nodes} edges={graph.edges.num_rows}")
 
 
 if __name__ == "__main__":
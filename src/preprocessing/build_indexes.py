@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import sys
+import json
+import math
+import shutil
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from ids import NULL_ID
+from tables import column_codec, open_dataset, row_group_fragments, scan_batches
+from inverted_index import (
+    DTYPE,
+    INDEX_LAYOUT,
+    INDEX_META,
+    INDEXES,
+    index_path,
+    open_index,
+    source_signature,
+)
+from instrument import record_run, stage
+
+RAW = REPO_ROOT / "data" / "raw"
+CACHE = REPO_ROOT / "data" / "cache"
+
+# Builds the inverted indexes described in inverted_index.py from the raw
+# tables (or their local copies). Tables larger than BUCKET_ROWS are indexed
+# out of core: one scan range-partitions (key, value) pairs on the key into
+# bucket files, then each bucket is sorted in memory and appended in order,
+# as in ingest_tables.py.
+BUCKET_ROWS = 1 << 25
+SAMPLE_ROW_GROUPS = 64
+
+
+def key_bounds(src: Path, key: str, buckets: int) -> np.ndarray:
+    """Quantiles of the key over a sample of row groups."""
+    frags = row_group_fragments(open_dataset(src), None)
+    step = max(1, len(frags) // SAMPLE_ROW_GROUPS)
+    codec = column_codec(src, key)
+    sample = np.concatenate([codec.encode(f.to_table(columns=[key]).column(key)).to_numpy() for f in frags[::step]])
+    qs = np.quantile(sample, np.linspace(0, 1, buckets + 1)[1:-1])
+    return np.unique(qs)
+
+
+class CSRWriter:
+    """Appends (key, value) pairs, key ranges in ascending order, as keys/offsets/values files."""
+
+    def __init__(self, out: Path) -> None:
+        self.out = out
+        self._files: dict[str, BinaryIO] = {n: (out / f"{n}.i64").open("wb") for n in ("keys", "offsets", "values")}
+        self.keys = 0
+        self.values = 0
+
+    def add(self, keys: np.ndarray, values: np.ndarray) -> None:
+        ok = (keys != NULL_ID) & (values != NULL_ID)
+        keys, values = keys[ok], values[ok]
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        if len(keys):
+            new = np.r_[True, (keys[1:] != keys[:-1]) | (values[1:] != values[:-1])]
+            keys, values = keys[new], values[new]
+        uniq, starts = np.unique(keys, return_index=True)
+        uniq.astype(DTYPE).tofile(self._files["keys"])
+        (starts + self.values).astype(DTYPE).tofile(self._files["offsets"])
+        values.astype(DTYPE).tofile(self._files["values"])
+        self.keys += len(uniq)
+        self.values += len(values)
+
+    def close(self) -> None:
+        np.array([self.values], dtype=DTYPE).tofile(self._files["offsets"])
+        for f in self._files.values():
+            f.close()
+
+
+def pairs(batch, key: str, value: str) -> tuple[np.ndarray, np.ndarray]:
+    return batch.column(key).to_numpy(), batch.column(value).to_numpy()
+
+
+def build_index(name: str, raw: Path = RAW) -> dict:
+    table, key, value = INDEXES[name]
+    src = raw / table
+    out = index_path(raw, name)
+    tmp = out.with_name(out.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    batches = scan_batches(src, [key, value], int_ids=[key, value])
+    csr = CSRWriter(tmp)
+    n_buckets = math.ceil(open_dataset(src).count_rows() / BUCKET_ROWS)
+    if n_buckets <= 1:
+        parts = [pairs(b, key, value) for b in batches]
+        if parts:
+            csr.add(np.concatenate([k for k, _ in parts]), np.concatenate([v for _, v in parts]))
+    else:
+        bounds = key_bounds(src, key, n_buckets)
+        bucket_dir = tmp / "_buckets"
+        bucket_dir.mkdir()
+        files: dict[int, tuple[BinaryIO, BinaryIO]] = {}
+        for batch in batches:
+            k, v = pairs(batch, key, value)
+            idx = np.searchsorted(bounds, k, side="right")
+            order = np.argsort(idx, kind="stable")
+            ids, starts = np.unique(idx[order], return_index=True)
+            k, v = k[order], v[order]
+            for b, start, end in zip(ids.tolist(), starts, np.r_[starts[1:], len(order)]):
+                if b not in files:
+                    files[b] = ((bucket_dir / f"{b:05d}.k").open("wb"), (bucket_dir / f"{b:05d}.v").open("wb"))
+                k[start:end].astype(DTYPE).tofile(files[b][0])
+                v[start:end].astype(DTYPE).tofile(files[b][1])
+        for fk, fv in files.values():
+            fk.close()
+            fv.close()
+        for b in sorted(files):
+            kpath, vpath = bucket_dir / f"{b:05d}.k", bucket_dir / f"{b:05d}.v"
+            csr.add(np.fromfile(kpath, dtype=DTYPE), np.fromfile(vpath, dtype=DTYPE))
+            kpath.unlink()
+            vpath.unlink()
+        bucket_dir.rmdir()
+    csr.close()
+
+    info = {
+        "layout": INDEX_LAYOUT,
+        "source": source_signature(src),
+        "table": table,
+        "key": key,
+        "value": value,
+        "key_prefix": column_codec(src, key).prefix,
+        "value_prefix": column_codec(src, value).prefix,
+        "keys": csr.keys,
+        "values": csr.values,
+    }
+    (tmp / INDEX_META).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    if out.exists():
+        shutil.rmtree(out)
+    tmp.rename(out)
+    return info
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    force = "--force" in args
+    names = [a for a in args if not a.startswith("--")] or list(INDEXES)
+    unknown = set(names) - set(INDEXES)
+    if unknown:
+        print(f"[ERROR] unknown index(es): {', '.join(sorted(unknown))}; known: {', '.join(INDEXES)}")
+        sys.exit(2)
+
+    spans: dict[str, dict] = {}
+    for name in names:
+        src = RAW / INDEXES[name][0]
+        if not src.exists():
+            print(f"[skip] not found: {src}")
+            continue
+        if not force and open_index(RAW, name) is not None:
+            print(f"OK (up to date): {name}")
+            continue
+        with stage(name) as span:
+            info = build_index(name)
+            span.rows(rows_out=info["values"])
+        spans[name] = span.to_dict()
+        print(f"OK: {name} | keys={info['keys']} values={info['values']}")
+    if spans:
+        record_run(CACHE, "build_indexes", spans)
+
+
+if __name__ == "__main__":
+    main()
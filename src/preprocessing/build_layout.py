@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pyarrow as pa
+
+THIS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = Path(__file__).resolve().parents[2]
+OUT = REPO_ROOT / "data" / "outputs"
+CACHE = REPO_ROOT / "data" / "cache"
+
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import load_config, write_output
+from snapshots import building, current_dir
+from graph_arrow import ArrowGraph, layout_metadata, layout_paths, load_graph
+from instrument import record_run, stage, step, trace_enabled
+
+# Precomputed drawing geometry for the graph outputs, so clients only draw:
+#
+#   radial layout  nodes on the unit circle, grouped by community (0 = largest
+#                  first), highest degree first within a community, with an
+#                  empty gap between communities
+#   edge bundles   hierarchical edge bundling over a two-level tree (root at
+#                  the centre, one control point per community at hub_radius):
+#                    across communities  u, hub(u), centre, hub(v), v
+#                    within a community  u, (u+hub)/2, hub, (hub+v)/2, v
+#                  straightened by beta (P = beta*P + (1-beta)*straight line),
+#                  ready for a B-spline (e.g. d3.curveBundle.beta(1)).
+#
+# All of it is vectorized over nodes and edges; the cost is a few array passes
+# per edge. Written as <graph>.layout.arrow and <graph>.bundles.arrow.
+CONTROL_POINTS = 5
+
+
+def layout_params(cfg: Dict[str, Any]) -> Dict[str, float]:
+    c = cfg.get("layout") or {}
+    return {
+        "beta": float(c.get("beta", 0.85)),
+        "hub_radius": float(c.get("hub_radius", 0.6)),
+        "gap": float(c.get("gap", 0.1)),
+    }
+
+
+def node_arrays(graph: ArrowGraph) -> tuple[np.ndarray, np.ndarray]:
+    """(community rank, degree) per node; one community and edge-count degree if the columns are missing."""
+    n = graph.num_nodes
+    if "community" in graph.nodes.column_names:
+        comm = graph.nodes.column("community").fill_null(-1).to_numpy().astype(np.int64)
+        _, comm = np.unique(comm, return_inverse=True)  # dense ranks, in community id order
+    else:
+        comm = np.zeros(n, dtype=np.int64)
+    if "degree" in graph.nodes.column_names:
+        degree = graph.nodes.column("degree").fill_null(0).to_numpy().astype(np.int64)
+    else:
+        src, dst = graph.positions()
+        degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    return comm.reshape(-1), degree
+
+
+def radial_layout(comm: np.ndarray, degree: np.ndarray, gap: float = 0.1) -> np.ndarray:
+    """
+    Angle per node (radians). `gap` is the fraction of the circle left empty,
+    split evenly between the communities.
+    """
+    n = len(comm)
+    if n == 0:
+        return np.zeros(0)
+    order = np.lexsort((np.arange(n), -degree, comm))
+    k = int(comm.max()) + 1
+    gap = min(max(gap, 0.0), 0.9) if k > 1 else 0.0
+    slot = np.empty(n)
+    slot[order] = np.arange(n)
+    angle = 2 * np.pi * ((1 - gap) * slot / n + gap * comm / k)
+    return angle
+
+
+def hubs(comm: np.ndarray, angle: np.ndarray, hub_radius: float) -> tuple[np.ndarray, np.ndarray]:
+    """Control point of each community: the middle of its arc, at hub_radius."""
+    k = int(comm.max()) + 1 if len(comm) else 0
+    mid = np.bincount(comm, weights=angle, minlength=k) / np.maximum(np.bincount(comm, minlength=k), 1)
+    return hub_radius * np.cos(mid), hub_radius * np.sin(mid)
+
+
+def bundle_points(
+    x: np.ndarray,
+    y: np.ndarray,
+    comm: np.ndarray,
+    hub_xy: tuple[np.ndarray, np.ndarray],
+    src: np.ndarray,
+    dst: np.ndarray,
+    beta: float = 0.85,
+) -> np.ndarray:
+    """Control points per edge, float32 of shape (edges, CONTROL_POINTS, 2)."""
+    p0 = np.stack([x[src], y[src]], axis=1)
+    p4 = np.stack([x[dst], y[dst]], axis=1)
+    hs = np.stack([hub_xy[0][comm[src]], hub_xy[1][comm[src]]], axis=1)
+    ht = np.stack([hub_xy[0][comm[dst]], hub_xy[1][comm[dst]]], axis=1)
+    same = (comm[src] == comm[dst])[:, None]
+
+    pts = np.empty((len(src), CONTROL_POINTS, 2))
+    pts[:, 0] = p0
+    pts[:, 1] = np.where(same, (p0 + hs) / 2, hs)
+    pts[:, 2] = np.where(same, hs, 0.0)
+    pts[:, 3] = np.where(same, (hs + p4) / 2, ht)
+    pts[:, 4] = p4
+
+    t = np.linspace(0.0, 1.0, CONTROL_POINTS)[None, :, None]
+    straight = p0[:, None, :] * (1 - t) + p4[:, None, :] * t
+    return (beta * pts + (1 - beta) * straight).astype(np.float32)
+
+
+def compute_layout(
+    graph: ArrowGraph, beta: float = 0.85, hub_radius: float = 0.6, gap: float = 0.1
+) -> tuple[pa.Table, pa.Table]:
+    """(node positions, edge control points) tables, row-aligned with the graph's nodes and edges."""
+    params = {"beta": beta, "hub_radius": hub_radius, "gap": gap, "control_points": CONTROL_POINTS}
+    metadata = layout_metadata(params, graph)
+
+    with step("radial_layout", rows_in=graph.num_nodes):
+        comm, degree = node_arrays(graph)
+        angle = radial_layout(comm, degree, gap)
+        x, y = np.cos(angle), np.sin(angle)
+    nodes = pa.table(
+        {
+            "angle": pa.array(angle.astype(np.float32)),
+            "x": pa.array(x.astype(np.float32)),
+            "y": pa.array(y.astype(np.float32)),
+        }
+    ).replace_schema_metadata(metadata)
+
+    with step("edge_bundles", rows_in=graph.edges.num_rows) as span:
+        src, dst = graph.positions()
+        pts = bundle_points(x, y, comm, hubs(comm, angle, hub_radius), src, dst, beta)
+        points = pa.FixedSizeListArray.from_arrays(pa.array(pts.reshape(-1)), CONTROL_POINTS * 2)
+        span.rows(rows_out=len(src))
+    edges = pa.table(
+        {
+            "source": graph.edges.column("source"),
+            "target": graph.edges.column("target"),
+            "points": points,
+        }
+    ).replace_schema_metadata(metadata)
+    return nodes, edges
+
+
+def layout_outputs(name: str, graph: ArrowGraph, cfg: Dict[str, Any]) -> dict[str, pa.Table]:
+    """{file name: table} for graph output `name` (e.g. papers_graph.json)."""
+    nodes, edges = compute_layout(graph, **layout_params(cfg))
+    layout_path, bundles_path = layout_paths(Path(name))
+    return {layout_path.name: nodes, bundles_path.name: edges}
+
+
+def main():
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+
+    src_dir = current_dir(OUT)
+    spans: Dict[str, Dict[str, Any]] = {}
+
+    with building(OUT) as snap:
+        for name in ["papers_graph.json", "authors_graph.json"]:
+            in_path = src_dir / name
+            if not in_path.exists():
+                print(f"[skip] not found: {in_path}")
+                continue
+
+            # same stage names as the pipeline (papers_layout, authors_layout)
+            with stage(name.replace("_graph.json", "_layout"), trace_enabled(cfg)) as span:
+                outputs = layout_outputs(name, load_graph(in_path), cfg)
+            spans[span.name] = span.to_dict()
+
+            for file_name, table in outputs.items():
+                write_output(table, snap / file_name)
+            print(f"[ok] wrote {', '.join(outputs)} | seconds={span.seconds}")
+
+    if spans:
+        record_run(CACHE, "build_layout", spans, snapshot=snap.name)
+
+
+if __name__ == "__main__":
+    main()
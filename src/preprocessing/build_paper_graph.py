@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import sys
 from pathlib import Path
+from typing import Iterator
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 THIS_DIR = Path(__file__).resolve().parent
 
@@ -15,125 +18,167 @@ def find_repo_root(start: Path) -> Path:
 REPO_ROOT = find_repo_root(THIS_DIR)
 sys.path.insert(0, str(THIS_DIR))
 
-from utils import load_config, compile_keywords, write_json 
+from utils import load_config, write_output
+from snapshots import building
+from cohort import Cohort, load_cohort
+from tables import scan_batches
+from ids import sorted_unique
+from graph_arrow import ArrowGraph, node_positions
+from instrument import attach, record_run, stage, step, trace_enabled
+from selection import EdgeScore, select_nodes, edge_score, degree_budget_mask
+
 RAW = REPO_ROOT / "data" / "raw"
 OUT = REPO_ROOT / "data" / "outputs"
-
-def main() -> None:
-    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
-
+CACHE = REPO_ROOT / "data" / "cache"
+
+def ref_batches(
+    refs: Path | pa.Table, node_ids: np.ndarray, batch_size: int = 1 << 20
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    (citing, cited) id arrays with both endpoints in node_ids, in paperrefs
+    order. refs is the paperrefs file (filter pushed into the scan) or an
+    already scanned (citing_paperid, cited_paperid) table covering node_ids,
+    e.g. one shared by several cohorts in batch mode.
+    """
+    if isinstance(refs, pa.Table):
+        for batch in refs.to_batches(max_chunksize=batch_size):
+            src = batch.column("citing_paperid").to_numpy()
+            dst = batch.column("cited_paperid").to_numpy()
+            keep = np.isin(src, node_ids) & np.isin(dst, node_ids)
+            if keep.any():
+                yield src[keep], dst[keep]
+        return
+
+    for batch in scan_batches(
+        refs,
+        ["citing_paperid", "cited_paperid"],
+        [("citing_paperid", "in", node_ids), ("cited_paperid", "in", node_ids)],
+        int_ids=["citing_paperid", "cited_paperid"],
+        batch_size=batch_size,
+    ):
+        yield batch.column("citing_paperid").to_numpy(), batch.column("cited_paperid").to_numpy()
+
+
+def collect_citation_edges(
+    refs: Path | pa.Table,
+    node_ids: np.ndarray,
+    max_edges: int,
+    score: EdgeScore | None = None,
+    batch_size: int = 1 << 20,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Streams paperrefs batch by batch, keeping only edges with both endpoints in
+    node_ids (pushed into the scan). Without a score the first max_edges
+    matches are kept and the scan stops as soon as the budget is met; with a
+    score the max_edges highest-scoring edges are kept in a bounded buffer
+    (ties: earlier rows first) and returned best first.
+    """
+    srcs: list[np.ndarray] = []
+    dsts: list[np.ndarray] = []
+    n = 0
+
+    keep_src = keep_dst = keep_score = keep_seq = np.zeros(0, dtype=np.int64)
+    seq0 = 0
+
+    for src, dst in ref_batches(refs, node_ids, batch_size):
+        if score is None:
+            take = max_edges - n
+            srcs.append(src[:take])
+            dsts.append(dst[:take])
+            n += min(take, len(src))
+            if n >= max_edges:
+                break
+            continue
+
+        seq = np.arange(seq0, seq0 + len(src))
+        seq0 += len(src)
+        keep_src = np.r_[keep_src, src]
+        keep_dst = np.r_[keep_dst, dst]
+        keep_score = np.r_[keep_score, score(src, dst)]
+        keep_seq = np.r_[keep_seq, seq]
+        if len(keep_src) > max_edges:
+            top = np.lexsort((keep_seq, -keep_score))[:max_edges]
+            keep_src, keep_dst, keep_score, keep_seq = keep_src[top], keep_dst[top], keep_score[top], keep_seq[top]
+
+    if score is None:
+        if not srcs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(srcs), np.concatenate(dsts)
+
+    order = np.lexsort((keep_seq, -keep_score))
+    return keep_src[order], keep_dst[order]
+
+
+def build_graph(cfg: dict, cohort: Cohort, raw: Path = RAW, refs: pa.Table | None = None) -> ArrowGraph:
     year_from, year_to = int(cfg["year_from"]), int(cfg["year_to"])
-    uni_pat = compile_keywords(cfg["university_keywords"])
-    field_pat = compile_keywords(cfg["field_keywords"])
     whitelist = set(cfg.get("institution_whitelist", []))
 
     max_nodes = int(cfg["paper_graph"]["max_nodes"])
     max_edges = int(cfg["paper_graph"]["max_edges"])
     sort_key = "citation_count"  # A
-
-    OUT.mkdir(parents=True, exist_ok=True)
-
-    papers = pd.read_parquet(
-        RAW / "sciscinet_papers.parquet",
-        columns=["paperid", "doi", "year", "doctype", sort_key],
-    )
-    papers["paperid"] = papers["paperid"].astype(str)
-    papers = papers[(papers["year"] >= year_from) & (papers["year"] <= year_to)]
-    dt_white = set(cfg.get("doctype_whitelist", []))
-    if dt_white:
-        papers["doctype"] = papers["doctype"].fillna("").astype(str)
-        papers = papers[papers["doctype"].isin(dt_white)]
-
-    doi_blacklist = cfg.get("doi_blacklist_regex", [])
-    if doi_blacklist:
-        doi_series = papers["doi"].fillna("").astype(str)
-
-        bad = pd.Series(False, index=papers.index)
-        for pat in doi_blacklist:
-            bad = bad | doi_series.str.contains(pat, regex=True)
-
-        papers = papers[~bad]
-
-    fields = pd.read_parquet(
-        RAW / "sciscinet_fields.parquet",
-        columns=["fieldid", "display_name"],
-    )
-    cs_fields = fields[fields["display_name"].fillna("").str.contains(field_pat)]
-    cs_fieldids = set(cs_fields["fieldid"].astype(str))
-
-    pf = pd.read_parquet(
-        RAW / "sciscinet_paperfields.parquet",
-        columns=["paperid", "fieldid"],
-    )
-    pf["paperid"] = pf["paperid"].astype(str)
-    pf["fieldid"] = pf["fieldid"].astype(str)
-    cs_papers = set(pf.loc[pf["fieldid"].isin(cs_fieldids), "paperid"])
-
-    aff = pd.read_parquet(
-        RAW / "sciscinet_affiliations.parquet",
-        columns=["institution_id", "display_name"],
-    )
-    dart_aff = aff[aff["display_name"].fillna("").str.contains(uni_pat)]
-    if whitelist:
-        dart_aff = dart_aff[dart_aff["display_name"].isin(whitelist)]
-    dart_inst_ids = set(dart_aff["institution_id"].astype(str))
-
-    paa = pd.read_parquet(
-        RAW / "sciscinet_paper_author_affiliation.parquet",
-        columns=["paperid", "institutionid"],
-    )
-    paa["paperid"] = paa["paperid"].astype(str)
-    paa["institutionid"] = paa["institutionid"].astype(str)
-    dart_papers = set(paa.loc[paa["institutionid"].isin(dart_inst_ids), "paperid"])
-
-    final_papers = cs_papers & dart_papers & set(papers["paperid"])
-
-    papers_sub = papers[papers["paperid"].isin(final_papers)]
-    papers_sub = papers_sub.sort_values(sort_key, ascending=False).head(max_nodes)
-    node_ids = set(papers_sub["paperid"])
-
-    nodes = []
-    for r in papers_sub.itertuples(index=False):
-        doi = getattr(r, "doi", None)
-        nodes.append(
-            {
-                "id": str(getattr(r, "paperid")),
-                "doi": None if pd.isna(doi) else str(doi),
-                "year": int(getattr(r, "year")),
-                sort_key: int(getattr(r, sort_key)),
-            }
-        )
-
-    refs = pd.read_parquet(
-        RAW / "sciscinet_paperrefs.parquet",
-        columns=["citing_paperid", "cited_paperid"],
-    )
-    refs["citing_paperid"] = refs["citing_paperid"].astype(str)
-    refs["cited_paperid"] = refs["cited_paperid"].astype(str)
-
-    refs = refs[
-        refs["citing_paperid"].isin(node_ids)
-        & refs["cited_paperid"].isin(node_ids)
-    ].head(max_edges)
-
-    edges = [{"source": r.citing_paperid, "target": r.cited_paperid} for r in refs.itertuples(index=False)]
-
-    graph = {
-        "meta": {
-            "type": "paper_citation_graph",
-            "year_range": [year_from, year_to],
-            "field": cfg["field_keywords"],
-            "institutions": list(whitelist),
-            "sort_key": sort_key,
-            "max_nodes": max_nodes,
-            "max_edges": max_edges,
-        },
-        "nodes": nodes,
-        "edges": edges,
+    strategy = cfg["paper_graph"].get("strategy", "top_cited")
+    edge_strategy = cfg["paper_graph"].get("edge_strategy", "first")
+    degree_budget = int(cfg["paper_graph"].get("degree_budget", 0) or 0)
+
+    window = cohort.papers_in(year_from, year_to)
+    with step("select_nodes", rows_in=len(window)) as span:
+        papers_sub = select_nodes(window, strategy, max_nodes)
+        node_ids = sorted_unique(papers_sub["paperid"])
+        span.rows(rows_out=len(node_ids))
+    pid_codec = cohort.codec("paperid")
+
+    with step("nodes"):
+        doi = papers_sub["doi"] if "doi" in papers_sub.columns else pd.Series([None] * len(papers_sub))
+        nodes = {
+            "id": pid_codec.decode(papers_sub["paperid"]),
+            "doi": pa.array(doi, from_pandas=True, type=pa.string()),
+            "year": papers_sub["year"].to_numpy().astype(np.int64),
+            sort_key: papers_sub[sort_key].to_numpy().astype(np.int64),
+        }
+
+    if refs is None:
+        refs = raw / "sciscinet_paperrefs.parquet"
+    with step("citation_edges") as span:
+        score = edge_score(edge_strategy, papers_sub)
+        if edge_strategy == "degree_budget" and degree_budget > 0:
+            # the budget is applied over every candidate edge, best first
+            src, dst = collect_citation_edges(refs, node_ids, len(node_ids) ** 2, score)
+            span.rows(rows_in=len(src))
+            keep = degree_budget_mask(src, dst, degree_budget)
+            src, dst = src[keep][:max_edges], dst[keep][:max_edges]
+        else:
+            src, dst = collect_citation_edges(refs, node_ids, max_edges, score)
+        span.rows(rows_out=len(src))
+
+    meta = {
+        "type": "paper_citation_graph",
+        "year_range": [year_from, year_to],
+        "field": cfg["field_keywords"],
+        "institutions": list(whitelist),
+        "sort_key": sort_key,
+        "strategy": strategy,
+        "edge_strategy": edge_strategy,
+        "degree_budget": degree_budget,
+        "max_nodes": max_nodes,
+        "max_edges": max_edges,
     }
+    with step("edges"):
+        node_pids = papers_sub["paperid"].to_numpy()
+        return ArrowGraph.from_columns(meta, nodes, node_positions(node_pids, src), node_positions(node_pids, dst))
+
 
-    write_json(graph, OUT / "papers_graph.json")
-    print(f"[OK] papers_graph.json | nodes={len(nodes)} edges={len(edges)}")
+def main() -> None:
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    with stage("papers_graph", trace_enabled(cfg)) as span:
+        with step("cohort"):
+            cohort = load_cohort(cfg, RAW, CACHE)
+        graph = build_graph(cfg, cohort)
+    attach({"papers_graph.json": graph}, span)
+
+    with building(OUT) as snap:
+        write_output(graph, snap / "papers_graph.json")
+    record_run(CACHE, "build_paper_graph", {span.name: span.to_dict()}, snapshot=snap.name)
+    print(f"[OK] papers_graph.json | nodes={graph.num_nodes} edges={graph.edges.num_rows}")
 
 if __name__ == "__main__":
     main()
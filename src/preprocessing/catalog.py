@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# Statistics catalog written by schema_probe_parquet.py, one entry per table:
+#
+#   {"version": 1, "tables": {"<table>.parquet": {
+#       "signature": [...],            # tables.table_signature when built
+#       "rows": N, "bytes": B,
+#       "columns": {col: {"nulls": n, "distinct": estimate, "bytes": b}},
+#       "row_groups": [{"file": "part-00000.parquet", "id": 0, "rows": n, "bytes": b,
+#                       "columns": {col: {"min": v, "max": v, "nulls": n, "distinct": d}}}]}}}
+#
+# Readers use it to drop row groups that cannot match a filter (exactly, for
+# "in" value sets of any size) and to estimate how many rows a filtered scan
+# returns, e.g. to decide which of two semi-joins to run first. An entry is
+# only used while its signature matches the table it describes.
+
+CATALOG_VERSION = 1
+CATALOG_NAME = "catalog.json"
+
+_NEVER = {"not in", "!="}  # ops min/max statistics cannot rule out
+
+
+def catalog_path(table_path: str | Path) -> Path:
+    # data/raw/<table> -> data/cache/catalog.json
+    return Path(table_path).parent.parent / "cache" / CATALOG_NAME
+
+
+@lru_cache(maxsize=4)
+def _read(path: str, mtime_ns: int) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def read_catalog(path: Path) -> dict:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return {"version": CATALOG_VERSION, "tables": {}}
+    return _read(str(path), st.st_mtime_ns)
+
+
+def table_entry(table_path: str | Path, signature: list) -> dict | None:
+    cat = read_catalog(catalog_path(table_path))
+    if cat.get("version") != CATALOG_VERSION:
+        return None
+    entry = cat["tables"].get(Path(table_path).name)
+    if entry is None or entry.get("signature") != signature:
+        return None
+    return entry
+
+
+def _may_match(stats: dict | None, rows: int, op: str, value: Any) -> bool:
+    if stats is None or op in _NEVER:
+        return True
+    if stats.get("nulls") == rows:
+        return False  # all null: no comparison or "in" matches
+    lo, hi = stats.get("min"), stats.get("max")
+    if lo is None or hi is None:
+        return True
+    try:
+        if op == "in":
+            # value is sorted; any value inside [lo, hi]?
+            return bool(np.searchsorted(value, lo, side="left") < np.searchsorted(value, hi, side="right"))
+        if op == "==":
+            return lo <= value <= hi
+        if op == "<":
+            return lo < value
+        if op == "<=":
+            return lo <= value
+        if op == ">":
+            return hi > value
+        if op == ">=":
+            return hi >= value
+    except TypeError:
+        pass  # statistics not comparable with the filter value
+    return True
+
+
+def matching_row_groups(entry: dict, filters: list[tuple[str, str, Any]]) -> list[dict]:
+    """
+    Row groups that may contain rows passing every filter. Values must be in
+    the column's stored form (sorted arrays for "in").
+    """
+    return [
+        rg
+        for rg in entry["row_groups"]
+        if all(_may_match(rg["columns"].get(col), rg["rows"], op, v) for col, op, v in filters)
+    ]
+
+
+def estimate_rows(entry: dict, filters: list[tuple[str, str, Any]]) -> float:
+    """
+    Rows a filtered scan returns, estimated as (rows in matching row groups)
+    x the "in" selectivities (values / distinct values of the column).
+    """
+    if entry["rows"] == 0:
+        return 0.0
+    rows = float(sum(rg["rows"] for rg in matching_row_groups(entry, filters)))
+    for col, op, value in filters:
+        distinct = (entry["columns"].get(col) or {}).get("distinct")
+        if op == "in" and distinct:
+            rows *= min(1.0, len(value) / distinct)
+    return rows
+
+
+def gee_distinct(counts: np.ndarray, sample_rows: int, total_rows: int) -> int:
+    """
+    Guaranteed-error estimator of the number of distinct values from value
+    frequencies in a sample: sqrt(N/n) * f1 + sum_{j>=2} f_j.
+    """
+    if sample_rows == 0:
+        return 0
+    f1 = int((counts == 1).sum())
+    rest = int((counts > 1).sum())
+    return int(round(np.sqrt(total_rows / sample_rows) * f1 + rest))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def paper_groups(
+    paperids: np.ndarray,
+    authorids: np.ndarray,
+    max_authors: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Distinct (paper, author) rows sorted by paper then author, plus the start
+    offset and size of each paper's block. Papers with fewer than two authors,
+    or more than max_authors (when > 0), are dropped.
+    """
+    p = np.asarray(paperids, dtype=np.int64)
+    a = np.asarray(authorids, dtype=np.int64)
+    order = np.lexsort((a, p))
+    p, a = p[order], a[order]
+
+    if len(p):
+        keep = np.r_[True, (p[1:] != p[:-1]) | (a[1:] != a[:-1])]
+        p, a = p[keep], a[keep]
+
+    starts = np.flatnonzero(np.r_[True, p[1:] != p[:-1]]) if len(p) else np.zeros(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(p)])
+
+    ok = sizes >= 2
+    if max_authors > 0:
+        ok &= sizes <= max_authors
+    if not ok.all():
+        row_ok = np.repeat(ok, sizes)
+        p, a = p[row_ok], a[row_ok]
+        sizes = sizes[ok]
+        starts = np.r_[0, np.cumsum(sizes)[:-1]] if len(sizes) else np.zeros(0, dtype=np.int64)
+
+    return p, a, starts, sizes
+
+
+def author_pairs(
+    paperids: np.ndarray,
+    authorids: np.ndarray,
+    max_authors: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All co-author pairs as arrays (paper, a, b) with a < b: one row per pair
+    per shared paper. This is the columnar equivalent of running
+    itertools.combinations over each paper's sorted author list.
+    """
+    p, a, starts, sizes = paper_groups(paperids, authorids, max_authors)
+    if len(sizes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Row k at local position i in a block of size n pairs with the n-1-i rows after it.
+    local = np.arange(len(a)) - np.repeat(starts, sizes)
+    fanout = np.repeat(sizes, sizes) - 1 - local
+
+    left = np.repeat(np.arange(len(a)), fanout)
+    first = np.repeat(np.cumsum(fanout) - fanout, fanout)
+    right = left + 1 + (np.arange(len(left)) - first)
+
+    return p[left], a[left], a[right]
+
+
+def coauthor_edges(
+    paperids: np.ndarray,
+    authorids: np.ndarray,
+    max_authors: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Weighted co-authorship edges (source, target, weight) with source < target,
+    weight = number of shared papers. Sorted by (source, target).
+    """
+    _, src, dst = author_pairs(paperids, authorids, max_authors)
+    if len(src) == 0:
+        return src, dst, np.zeros(0, dtype=np.int64)
+
+    # Pack each pair into one int64 key over dense author codes and count keys.
+    uniq, codes = np.unique(np.r_[src, dst], return_inverse=True)
+    n = np.int64(len(uniq))
+    keys = codes[: len(src)] * n + codes[len(src):]
+    keys, weight = np.unique(keys, return_counts=True)
+
+    return uniq[keys // n], uniq[keys % n], weight.astype(np.int64)
+
+
+def strongest_k_mask(src: np.ndarray, dst: np.ndarray, weight: np.ndarray, k: int) -> np.ndarray:
+    """
+    Boolean mask of edges that are among the k strongest edges of at least one
+    endpoint. Ties are broken by (source, target) ascending.
+    """
+    m = len(src)
+    if m == 0:
+        return np.zeros(0, dtype=bool)
+
+    # Each edge appears once per endpoint; rank within each endpoint's block.
+    node = np.r_[src, dst]
+    eid = np.r_[np.arange(m), np.arange(m)]
+    order = np.lexsort((np.r_[dst, dst], np.r_[src, src], -np.r_[weight, weight], node))
+    node = node[order]
+
+    starts = np.flatnonzero(np.r_[True, node[1:] != node[:-1]])
+    rank = np.arange(len(node)) - np.repeat(starts, np.diff(np.r_[starts, len(node)]))
+
+    keep = np.zeros(m, dtype=bool)
+    keep[eid[order][rank < k]] = True
+    return keep
+
+
+def node_strength(
+    src: np.ndarray, dst: np.ndarray, weight: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Node ids (sorted) with their degree and weighted degree."""
+    nodes, codes = np.unique(np.r_[src, dst], return_inverse=True)
+    deg = np.bincount(codes, minlength=len(nodes))
+    wdeg = np.bincount(codes, weights=np.r_[weight, weight], minlength=len(nodes)).astype(np.int64)
+    return nodes, deg, wdeg
+
+
+def top_nodes(nodes: np.ndarray, score: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest-scoring nodes, ties by node id ascending."""
+    return np.lexsort((nodes, -score))[:n]
+
+
+def prune_edges(
+    src: np.ndarray,
+    dst: np.ndarray,
+    weight: np.ndarray,
+    min_weight: int,
+    strongest_k: int,
+    max_nodes: int,
+) -> tuple[tuple[np.ndarray, np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    min_weight -> strongest_k per node -> top max_nodes by weighted degree.
+    Returns the kept edges (src, dst, weight) and the kept nodes
+    (ids ranked by weighted degree, degree, weighted degree). Degrees are
+    measured after the strongest-k step, before the node cap.
+    """
+    strong = weight >= min_weight
+    src, dst, weight = src[strong], dst[strong], weight[strong]
+
+    keep = strongest_k_mask(src, dst, weight, strongest_k)
+    src, dst, weight = src[keep], dst[keep], weight[keep]
+
+    nodes, deg, wdeg = node_strength(src, dst, weight)
+    top = top_nodes(nodes, wdeg, max_nodes)
+    nodes, deg, wdeg = nodes[top], deg[top], wdeg[top]
+
+    top_sorted = np.sort(nodes)
+    inside = np.isin(src, top_sorted) & np.isin(dst, top_sorted)
+    return (src[inside], dst[inside], weight[inside]), (nodes, deg, wdeg)
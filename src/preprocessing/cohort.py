@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import sys
+import json
+import shutil
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import load_config, compile_keywords
+from ids import IdCodec, sorted_unique
+from tables import read_parquet, year_filters, column_codec, local_copy, table_signature, estimate_rows
+from instrument import record_run, stage, step, trace_enabled
+
+RAW = REPO_ROOT / "data" / "raw"
+CACHE = REPO_ROOT / "data" / "cache"
+
+# Config keys that decide which papers are in the cohort. Anything else
+# (graph caps, strategies, ...) is downstream and must not invalidate it.
+COHORT_KEYS = [
+    "year_from",
+    "year_to",
+    "field_keywords",
+    "university_keywords",
+    "institution_whitelist",
+    "doctype_whitelist",
+    "doi_blacklist_regex",
+]
+
+COHORT_TABLES = [
+    "sciscinet_papers.parquet",
+    "sciscinet_fields.parquet",
+    "sciscinet_paperfields.parquet",
+    "sciscinet_affiliations.parquet",
+    "sciscinet_paper_author_affiliation.parquet",
+]
+
+# Bump when the artifact layout changes so old caches are not reused.
+COHORT_VERSION = 4
+
+# Cohort tables are stored as uncompressed Arrow IPC files and memory-mapped
+# on read. The frames are built over the mapped buffers without a copy where
+# the layout allows it (numeric columns without nulls, string data), so
+# parallel pipeline workers share those pages through the page cache instead
+# of each holding (or being sent) a private copy; columns that need
+# converting (e.g. integers with nulls) are copied per process.
+COHORT_FRAMES = ["papers", "paa", "institutions"]
+
+PAPER_COLUMNS = ["paperid", "doi", "year", "doctype", "citation_count", "patent_count"]
+
+# T2 dashboards look back this many years from year_to, so the cohort
+# spans the wider of the T1 window and the T2 window.
+T2_YEARS = 10
+
+
+def t2_year_range(cfg: dict) -> tuple[int, int]:
+    year_to = int(cfg["year_to"])
+    return year_to - T2_YEARS + 1, year_to
+
+
+def cohort_year_range(cfg: dict) -> tuple[int, int]:
+    year_to = int(cfg["year_to"])
+    return min(int(cfg["year_from"]), t2_year_range(cfg)[0]), year_to
+
+
+def cohort_key(cfg: dict) -> str:
+    sub = {k: cfg.get(k) for k in COHORT_KEYS}
+    sub["_version"] = COHORT_VERSION
+    blob = json.dumps(sub, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def raw_signature(raw: Path, tables: list[str] = COHORT_TABLES) -> dict:
+    sig = {}
+    for fname in tables:
+        path = raw / fname
+        if path.exists() or local_copy(path) is not None:
+            sig[fname] = table_signature(path)
+    return sig
+
+
+@dataclass
+class Cohort:
+    key: str
+    year_range: tuple[int, int]
+    papers: pd.DataFrame  # cohort papers over year_range, PAPER_COLUMNS
+    paa: pd.DataFrame  # paper_author_affiliation rows of cohort papers
+    institutions: pd.DataFrame  # institutionid -> institution_name for ids in paa
+    cs_fieldids: list[int]
+    field_names: list[str]  # display names of the fields matched by field_keywords
+    inst_ids: list[int]
+    inst_names: list[str]
+    id_prefixes: dict[str, str]  # id column -> prefix, see ids.py
+
+    def papers_in(self, year_from: int, year_to: int) -> pd.DataFrame:
+        p = self.papers
+        return p[(p["year"] >= year_from) & (p["year"] <= year_to)]
+
+    def paper_ids(self, year_from: int, year_to: int) -> np.ndarray:
+        return sorted_unique(self.papers_in(year_from, year_to)["paperid"])
+
+    def codec(self, column: str) -> IdCodec:
+        return IdCodec(self.id_prefixes.get(column, ""))
+
+
+def _union(values: list[set]) -> list:
+    out: set = set()
+    for v in values:
+        out |= v
+    return sorted(out)
+
+
+def build_cohorts(cfgs: list[dict], raw: Path = RAW) -> list[Cohort]:
+    """
+    Builds one cohort per config with a single filtered scan per raw table
+    phase: every scan pushes down the union of the cohorts' filters, and each
+    cohort is then cut from the shared result in memory (row order kept, so
+    a cohort comes out the same as when it is built on its own).
+    """
+    papers_path = raw / "sciscinet_papers.parquet"
+    pf_path = raw / "sciscinet_paperfields.parquet"
+    aff_path = raw / "sciscinet_affiliations.parquet"
+    paa_path = raw / "sciscinet_paper_author_affiliation.parquet"
+
+    ranges = [cohort_year_range(cfg) for cfg in cfgs]
+    dt_whites = [set(cfg.get("doctype_whitelist", [])) for cfg in cfgs]
+
+    paper_filters = year_filters(min(r[0] for r in ranges), max(r[1] for r in ranges))
+    if all(dt_whites):
+        paper_filters.append(("doctype", "in", _union(dt_whites)))
+    with step("papers_scan") as span:
+        all_papers = read_parquet(papers_path, PAPER_COLUMNS, paper_filters, int_ids=["paperid"])
+        span.rows(rows_out=len(all_papers))
+
+    fields = read_parquet(raw / "sciscinet_fields.parquet", ["fieldid", "display_name"], int_ids=["fieldid"])
+    field_names = fields["display_name"].fillna("")
+    aff = read_parquet(aff_path, ["institution_id", "display_name"], int_ids=["institution_id"])
+    aff_names = aff["display_name"].fillna("")
+
+    papers_by: list[pd.DataFrame] = []
+    fieldids_by: list[np.ndarray] = []
+    field_names_by: list[list[str]] = []
+    dart_aff_by: list[pd.DataFrame] = []
+    for cfg, (year_from, year_to), dt_white in zip(cfgs, ranges, dt_whites):
+        papers = all_papers[(all_papers["year"] >= year_from) & (all_papers["year"] <= year_to)]
+        if dt_white:
+            papers = papers[papers["doctype"].isin(dt_white)].copy()
+            papers["doctype"] = papers["doctype"].fillna("").astype(str)
+
+        doi_blacklist = cfg.get("doi_blacklist_regex", [])
+        if doi_blacklist:
+            doi_series = papers["doi"].fillna("").astype(str)
+            bad = pd.Series(False, index=papers.index)
+            for pat in doi_blacklist:
+                bad = bad | doi_series.str.contains(pat, regex=True)
+            papers = papers[~bad]
+        papers_by.append(papers)
+
+        cs_fields = fields[field_names.str.contains(compile_keywords(cfg["field_keywords"]))]
+        fieldids_by.append(sorted_unique(cs_fields["fieldid"]))
+        field_names_by.append(cs_fields["display_name"].astype(str).tolist())
+
+        whitelist = set(cfg.get("institution_whitelist", []))
+        dart_aff = aff[aff_names.str.contains(compile_keywords(cfg["university_keywords"]))]
+        if whitelist:
+            dart_aff = dart_aff[dart_aff["display_name"].isin(whitelist)]
+        dart_aff_by.append(dart_aff)
+
+    inst_ids_by = [sorted_unique(a["institution_id"]) for a in dart_aff_by]
+    field_filter = ("fieldid", "in", _union([set(f.tolist()) for f in fieldids_by]))
+    inst_filter = ("institutionid", "in", _union([set(i.tolist()) for i in inst_ids_by]))
+    pf_scan = (pf_path, ["paperid", "fieldid"], field_filter, ["paperid", "fieldid"])
+    paa_scan = (paa_path, ["paperid", "institutionid"], inst_filter, ["paperid", "institutionid"])
+
+    # Both semi-joins end up intersected with the cohorts' papers. With catalog
+    # estimates, the more selective one runs first and the second is restricted
+    # to the papers that survived it; the per-cohort cuts below are unchanged.
+    with step("semi_joins") as span:
+        est_pf = estimate_rows(pf_path, [field_filter])
+        est_paa = estimate_rows(paa_path, [inst_filter])
+        if est_pf is not None and est_paa is not None:
+            first, second = (pf_scan, paa_scan) if est_pf <= est_paa else (paa_scan, pf_scan)
+            candidates = np.unique(np.concatenate([sorted_unique(p["paperid"]) for p in papers_by]))
+            path, columns, filt, ids = first
+            head = read_parquet(path, columns, [filt, ("paperid", "in", candidates)], int_ids=ids)
+            candidates = np.intersect1d(candidates, sorted_unique(head["paperid"]), assume_unique=True)
+            path, columns, filt, ids = second
+            tail = read_parquet(path, columns, [filt, ("paperid", "in", candidates)], int_ids=ids)
+            pf, dart_paa = (head, tail) if first is pf_scan else (tail, head)
+        else:
+            pf = read_parquet(pf_path, pf_scan[1], [field_filter], int_ids=pf_scan[3])
+            dart_paa = read_parquet(paa_path, paa_scan[1], [inst_filter], int_ids=paa_scan[3])
+        span.rows(rows_out=len(pf) + len(dart_paa))
+
+    final_by = []
+    for papers, cs_fieldids, inst_ids in zip(papers_by, fieldids_by, inst_ids_by):
+        cs_papers = sorted_unique(pf.loc[pf["fieldid"].isin(cs_fieldids), "paperid"])
+        dart_papers = sorted_unique(dart_paa.loc[dart_paa["institutionid"].isin(inst_ids), "paperid"])
+        final_papers = np.intersect1d(sorted_unique(papers["paperid"]), cs_papers, assume_unique=True)
+        final_by.append(np.intersect1d(final_papers, dart_papers, assume_unique=True))
+
+    with step("paa_scan") as span:
+        all_paa = read_parquet(
+            paa_path,
+            ["paperid", "authorid", "institutionid"],
+            [("paperid", "in", _union([set(f.tolist()) for f in final_by]))],
+            int_ids=["paperid", "authorid", "institutionid"],
+        )
+        span.rows(rows_out=len(all_paa))
+
+    id_prefixes = {
+        "paperid": column_codec(papers_path, "paperid").prefix,
+        "fieldid": column_codec(pf_path, "fieldid").prefix,
+        "authorid": column_codec(paa_path, "authorid").prefix,
+        "institutionid": column_codec(paa_path, "institutionid").prefix,
+    }
+
+    cohorts = []
+    for cfg, (year_from, year_to), papers, cs_fieldids, field_names, inst_ids, dart_aff, final_papers in zip(
+        cfgs, ranges, papers_by, fieldids_by, field_names_by, inst_ids_by, dart_aff_by, final_by
+    ):
+        paa = all_paa[all_paa["paperid"].isin(final_papers)].reset_index(drop=True)
+        institutions = aff[aff["institution_id"].isin(paa["institutionid"].unique())]
+        institutions = institutions.rename(
+            columns={"institution_id": "institutionid", "display_name": "institution_name"}
+        ).reset_index(drop=True)
+
+        cohorts.append(
+            Cohort(
+                key=cohort_key(cfg),
+                year_range=(year_from, year_to),
+                papers=papers[papers["paperid"].isin(final_papers)].reset_index(drop=True),
+                paa=paa,
+                institutions=institutions,
+                cs_fieldids=cs_fieldids.tolist(),
+                field_names=field_names,
+                inst_ids=inst_ids.tolist(),
+                inst_names=dart_aff["display_name"].astype(str).tolist(),
+                id_prefixes=id_prefixes,
+            )
+        )
+    return cohorts
+
+
+def build_cohort(cfg: dict, raw: Path = RAW) -> Cohort:
+    return build_cohorts([cfg], raw)[0]
+
+
+def write_arrow(df: pd.DataFrame, path: Path) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_arrow(path: Path) -> pd.DataFrame:
+    # split_blocks: one block per column, so numpy columns can view the mapped
+    # buffers instead of being consolidated into a new 2-D array; the mapping
+    # stays alive as long as the frame's buffers do (columns are read-only)
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def save_cohort(cohort: Cohort, path: Path, raw: Path = RAW) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    for name in COHORT_FRAMES:
+        write_arrow(getattr(cohort, name), tmp / f"{name}.arrow")
+
+    meta = {
+        "key": cohort.key,
+        "year_range": list(cohort.year_range),
+        "cs_fieldids": cohort.cs_fieldids,
+        "field_names": cohort.field_names,
+        "inst_ids": cohort.inst_ids,
+        "inst_names": cohort.inst_names,
+        "id_prefixes": cohort.id_prefixes,
+        "raw_signature": raw_signature(raw),
+        "papers": len(cohort.papers),
+    }
+    (tmp / "cohort.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.rename(path)
+
+
+def read_cohort(path: Path) -> Cohort:
+    meta = json.loads((path / "cohort.json").read_text(encoding="utf-8"))
+    return Cohort(
+        key=meta["key"],
+        year_range=tuple(meta["year_range"]),
+        papers=read_arrow(path / "papers.arrow"),
+        paa=read_arrow(path / "paa.arrow"),
+        institutions=read_arrow(path / "institutions.arrow"),
+        cs_fieldids=meta["cs_fieldids"],
+        field_names=meta["field_names"],
+        inst_ids=meta["inst_ids"],
+        inst_names=meta["inst_names"],
+        id_prefixes=meta["id_prefixes"],
+    )
+
+
+def cohort_path(cfg: dict, cache: Path = CACHE) -> Path:
+    return cache / f"cohort-{cohort_key(cfg)}"
+
+
+def is_fresh(path: Path, raw: Path = RAW) -> bool:
+    meta_path = path / "cohort.json"
+    if not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return meta.get("raw_signature") == raw_signature(raw)
+
+
+def load_cohorts(cfgs: list[dict], raw: Path = RAW, cache: Path = CACHE, rebuild: bool = False) -> list[Cohort]:
+    """
+    Returns the cohort for each cfg, reading fresh artifacts from the cache and
+    building all missing/stale ones together (see build_cohorts).
+    """
+    paths = [cohort_path(cfg, cache) for cfg in cfgs]
+    loaded: dict[Path, Cohort] = {}
+    for path in paths:
+        if path not in loaded and not rebuild and is_fresh(path, raw):
+            loaded[path] = read_cohort(path)
+
+    todo: dict[Path, dict] = {}
+    for cfg, path in zip(cfgs, paths):
+        if path not in loaded:
+            todo.setdefault(path, cfg)
+    if todo:
+        for path, cohort in zip(todo, build_cohorts(list(todo.values()), raw)):
+            save_cohort(cohort, path, raw)
+            loaded[path] = cohort
+    return [loaded[path] for path in paths]
+
+
+def load_cohort(cfg: dict, raw: Path = RAW, cache: Path = CACHE, rebuild: bool = False) -> Cohort:
+    """
+    Returns the cohort for cfg, building and persisting it on first use.
+    The artifact is keyed by a hash of COHORT_KEYS and rebuilt when the raw tables change.
+    """
+    return load_cohorts([cfg], raw, cache, rebuild)[0]
+
+
+def main() -> None:
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    with stage("cohort", trace_enabled(cfg)) as span:
+        cohort = load_cohort(cfg, rebuild="--rebuild" in sys.argv[1:])
+        span.rows(rows_out=len(cohort.papers))
+    record_run(CACHE, "cohort", {span.name: span.to_dict()}, key=cohort.key)
+    print(
+        f"[OK] cohort {cohort.key} | years={cohort.year_range[0]}-{cohort.year_range[1]} "
+        f"papers={len(cohort.papers)} paa_rows={len(cohort.paa)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
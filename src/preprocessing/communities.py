@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+
+# Community detection on array-based weighted adjacency.
+#
+# Graphs are given as n plus edge arrays (src, dst, weight) over node
+# positions 0..n-1. They are symmetrized into CSR (indptr, indices, data);
+# duplicate edges are merged by summing weights and self-loops dropped.
+# Every engine returns a community id per node, renumbered by community
+# size (largest = 0, ties by smallest member), so ids are reproducible for
+# a fixed seed.
+
+
+def adjacency(
+    n: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    w = np.ones(len(src)) if weight is None else np.asarray(weight, dtype=np.float64)
+
+    loop = src == dst
+    src, dst, w = src[~loop], dst[~loop], w[~loop]
+
+    rows = np.r_[src, dst]
+    cols = np.r_[dst, src]
+    keys, inv = np.unique(rows * n + cols, return_inverse=True)
+    data = np.bincount(inv, weights=np.r_[w, w])
+    rows, indices = keys // n, keys % n
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, indices, data
+
+
+def relabel_by_size(labels: np.ndarray) -> np.ndarray:
+    uniq, inv, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    first = np.full(len(uniq), len(labels), dtype=np.int64)
+    np.minimum.at(first, inv, np.arange(len(labels)))
+    order = np.lexsort((first, -counts))
+    new_id = np.empty(len(uniq), dtype=np.int64)
+    new_id[order] = np.arange(len(uniq))
+    return new_id[inv]
+
+
+def modularity(
+    indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, labels: np.ndarray, resolution: float = 1.0
+) -> float:
+    two_m = data.sum()
+    if two_m == 0:
+        return 0.0
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    inside = data[labels[rows] == labels[indices]].sum()
+    strength = np.bincount(rows, weights=data, minlength=len(indptr) - 1)
+    tot = np.bincount(labels, weights=strength)
+    return float(inside / two_m - resolution * np.sum((tot / two_m) ** 2))
+
+
+def label_propagation(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    data: np.ndarray,
+    seed: int = 42,
+    max_iter: int = 100,
+    tol: float = 1e-3,
+) -> np.ndarray:
+    """
+    Weighted label propagation, vectorized over all edges per sweep. Each
+    sweep updates a random half of the nodes (avoids the oscillation of fully
+    synchronous updates); ties between labels are broken by seeded noise.
+    """
+    n = len(indptr) - 1
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n, dtype=np.int64)
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    has_nb = np.diff(indptr) > 0
+
+    for _ in range(max_iter):
+        keys, inv = np.unique(rows * n + labels[indices], return_inverse=True)
+        krow, klab = keys // n, keys % n
+        # keys are sorted by row, so the per-row best label is a segmented max
+        score = np.bincount(inv, weights=data) * (1.0 + 1e-9 * rng.random(len(keys)))
+        starts = np.flatnonzero(np.r_[True, krow[1:] != krow[:-1]])
+        top = np.maximum.reduceat(score, starts)
+        hit = score == np.repeat(top, np.diff(np.r_[starts, len(keys)]))
+        hit_pos = np.flatnonzero(hit)
+        first = hit_pos[np.r_[True, krow[hit_pos][1:] != krow[hit_pos][:-1]]]
+        best = labels.copy()
+        best[krow[first]] = klab[first]
+
+        update = has_nb & (rng.random(n) < 0.5)
+        changed = update & (best != labels)
+        labels[changed] = best[changed]
+
+        # converged once (almost) no node would change its label
+        if (has_nb & (best != labels)).sum() <= tol * n:
+            break
+    return labels
+
+
+def _local_moving(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    data: np.ndarray,
+    resolution: float,
+    rng: np.random.Generator,
+) -> tuple[np.ndarray, bool]:
+    """
+    Queue-based local moving: every node is visited once in random order,
+    and after a move only its neighbours outside the new community are
+    queued again, instead of sweeping all nodes until nothing changes.
+    """
+    n = len(indptr) - 1
+    ptr = indptr.tolist()
+    ind = indices.tolist()
+    wts = data.tolist()
+    strength = np.bincount(np.repeat(np.arange(n), np.diff(indptr)), weights=data, minlength=n).tolist()
+    two_m = float(sum(strength))
+
+    comm = list(range(n))
+    tot = list(strength)
+    moved = False
+
+    queue = deque(rng.permutation(n).tolist())
+    queued = [True] * n
+    while queue:
+        i = queue.popleft()
+        queued[i] = False
+        ci = comm[i]
+        ki = strength[i]
+        links: dict[int, float] = {}
+        for p in range(ptr[i], ptr[i + 1]):
+            j = ind[p]
+            if j != i:
+                cj = comm[j]
+                links[cj] = links.get(cj, 0.0) + wts[p]
+
+        tot[ci] -= ki
+        best = ci
+        best_gain = links.get(ci, 0.0) - resolution * tot[ci] * ki / two_m
+        for c, w in links.items():
+            gain = w - resolution * tot[c] * ki / two_m
+            if gain > best_gain + 1e-12:
+                best, best_gain = c, gain
+        tot[best] += ki
+
+        if best != ci:
+            comm[i] = best
+            moved = True
+            for p in range(ptr[i], ptr[i + 1]):
+                j = ind[p]
+                if not queued[j] and comm[j] != best:
+                    queued[j] = True
+                    queue.append(j)
+
+    return np.asarray(comm, dtype=np.int64), moved
+
+
+def louvain(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    data: np.ndarray,
+    seed: int = 42,
+    resolution: float = 1.0,
+    max_levels: int = 20,
+) -> np.ndarray:
+    """
+    Louvain modularity optimisation: node-local moves over CSR rows, then the
+    graph is aggregated per community with vectorized key sums, until no
+    node moves.
+    """
+    n = len(indptr) - 1
+    labels = np.arange(n, dtype=np.int64)
+    if data.sum() == 0:
+        return labels
+
+    rng = np.random.default_rng(seed)
+    for _ in range(max_levels):
+        comm, moved = _local_moving(indptr, indices, data, resolution, rng)
+        if not moved:
+            break
+        _, comm = np.unique(comm, return_inverse=True)
+        labels = comm[labels]
+
+        k = int(comm.max()) + 1
+        rows = comm[np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))]
+        cols = comm[indices]
+        keys, inv = np.unique(rows * k + cols, return_inverse=True)
+        data = np.bincount(inv, weights=data)
+        indices = keys % k
+        indptr = np.zeros(k + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // k, minlength=k), out=indptr[1:])
+    return labels
+
+
+def greedy_modularity(
+    indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, seed: int = 42, resolution: float = 1.0
+) -> np.ndarray:
+    """networkx greedy_modularity_communities (slow; kept for comparison with older builds)."""
+    import networkx as nx
+    from networkx.algorithms.community import greedy_modularity_communities
+
+    n = len(indptr) - 1
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    upper = rows < indices
+    G = nx.Graph()
+    G.add_nodes_from(range(n))
+    G.add_weighted_edges_from(zip(rows[upper].tolist(), indices[upper].tolist(), data[upper].tolist()))
+
+    labels = np.arange(n, dtype=np.int64)
+    if G.number_of_edges() == 0:
+        return labels
+    for cid, cset in enumerate(greedy_modularity_communities(G, weight="weight", resolution=resolution)):
+        labels[list(cset)] = cid
+    return labels
+
+
+ENGINES = {
+    "louvain": lambda a, seed, resolution: louvain(*a, seed=seed, resolution=resolution),
+    "label_propagation": lambda a, seed, resolution: label_propagation(*a, seed=seed),
+    "greedy": lambda a, seed, resolution: greedy_modularity(*a, seed=seed, resolution=resolution),
+}
+
+
+def detect(
+    n: int,
+    src: np.ndarray,
+    dst: np.ndarray,
+    weight: np.ndarray | None = None,
+    engine: str = "louvain",
+    seed: int = 42,
+    resolution: float = 1.0,
+) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Returns (community per node, degree per node, stats). Degree is the number
+    of distinct neighbours.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown community engine {engine!r}; expected one of {sorted(ENGINES)}")
+    adj = adjacency(n, src, dst, weight)
+    labels = relabel_by_size(ENGINES[engine](adj, seed, resolution)) if n else np.zeros(0, dtype=np.int64)
+    degree = np.diff(adj[0])
+    stats = {
+        "engine": engine,
+        "seed": seed,
+        "resolution": resolution,
+        "communities": int(labels.max()) + 1 if n else 0,
+        "modularity": round(modularity(*adj, labels, resolution), 6) if n else 0.0,
+    }
+    return labels, degree, stats
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import sys
 from pathlib import Path
-import pandas as pd
 
 THIS_DIR = Path(__file__).resolve().parent
 
@@ -13,6 +12,10 @@ def find_repo_root(start: Path) -> Path:
     return Path.cwd()
 
 REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from tables import read_parquet
+
 RAW = REPO_ROOT / "data" / "raw"
 OUT = REPO_ROOT / "data" / "outputs"
 
@@ -29,9 +32,10 @@ def main() -> None:
     shared_ids = [x.strip() for x in shared_path.read_text(encoding="utf-8").splitlines() if x.strip()]
     shared_ids = list(dict.fromkeys(shared_ids)) 
 
-    papers = pd.read_parquet(
+    papers = read_parquet(
         RAW / "sciscinet_papers.parquet",
-        columns=["paperid", "doi", "year", "doctype"],
+        ["paperid", "doi", "year", "doctype"],
+        [("paperid", "in", shared_ids)],
     )
     papers["paperid"] = papers["paperid"].astype(str)
 
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import json
+import os
+import hashlib
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Columnar form of the graph outputs, written next to their JSON in the same
+# snapshot:
+#
+#   papers_graph.json         (unchanged, for clients and tools that read JSON)
+#   papers_graph.nodes.arrow  one row per node, one column per node key
+#   papers_graph.edges.arrow  source/target as int32 node positions + edge keys
+#
+# Arrow IPC files, uncompressed so they can be memory-mapped and read without
+# a copy; string columns are dictionary-encoded (institution names, dois and
+# ids repeat little, but communities/doctypes/names do). meta is stored as
+# JSON in the node table's schema metadata. Used by the communities stage and
+# the API (no JSON parse, no per-edge id lookups); JSON for HTTP clients is
+# generated from the tables. Kept numpy/pyarrow-only: the API imports it.
+#
+# The optional layout stage adds <graph>.layout.arrow (node positions) and
+# <graph>.bundles.arrow (edge control points), row-aligned with the node and
+# edge tables and tagged with the graph_signature they were computed for.
+GRAPH_OUTPUTS = ("papers_graph.json", "authors_graph.json")
+ARROW_LAYOUT = 1
+BATCH_ROWS = 65536  # rows turned into JSON objects at a time by the iter_* methods
+_META_KEY = b"meta"
+_LAYOUT_KEY = b"layout"
+_GRAPH_KEY = b"graph"  # graph_signature of the graph a layout table was computed for
+
+
+def arrow_paths(json_path: Path) -> tuple[Path, Path]:
+    """(nodes, edges) Arrow files that accompany a graph JSON output."""
+    stem = json_path.name[: -len(".json")] if json_path.name.endswith(".json") else json_path.name
+    return json_path.with_name(f"{stem}.nodes.arrow"), json_path.with_name(f"{stem}.edges.arrow")
+
+
+def layout_paths(json_path: Path) -> tuple[Path, Path]:
+    """(node positions, edge control points) written by the layout stage (build_layout.py)."""
+    stem = json_path.name[: -len(".json")] if json_path.name.endswith(".json") else json_path.name
+    return json_path.with_name(f"{stem}.layout.arrow"), json_path.with_name(f"{stem}.bundles.arrow")
+
+
+def companion_files(name: str) -> list[str]:
+    """File names written alongside output `name` (none for non-graph outputs)."""
+    if name not in GRAPH_OUTPUTS:
+        return []
+    return [p.name for p in arrow_paths(Path(name))]
+
+
+def node_positions(node_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Position in node_ids (unique, any order) of each of values, which must all be in node_ids."""
+    order = np.argsort(node_ids, kind="stable")
+    return order[np.searchsorted(node_ids[order], values)]
+
+
+def _column(values: list) -> pa.Array:
+    arr = pa.array(values, from_pandas=True)  # NaN (pandas' missing value) -> null
+    if pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type):
+        return arr.dictionary_encode()
+    return arr
+
+
+@dataclass(frozen=True)
+class ArrowGraph:
+    meta: dict
+    nodes: pa.Table
+    edges: pa.Table  # source, target: int32 positions into nodes
+
+    @classmethod
+    def from_dict(cls, graph: dict) -> ArrowGraph:
+        """Tables for a graph JSON object; edges whose endpoints are not nodes are dropped."""
+        nodes = graph.get("nodes", [])
+        edges = graph.get("edges", [])
+
+        keys: dict[str, None] = {}
+        for n in nodes:
+            keys.update(dict.fromkeys(n))
+        node_table = pa.table({k: _column([n.get(k) for n in nodes]) for k in keys}) if keys else pa.table({})
+
+        index = {str(n["id"]): i for i, n in enumerate(nodes)}
+        src = np.fromiter((index.get(str(e.get("source")), -1) for e in edges), dtype=np.int64, count=len(edges))
+        dst = np.fromiter((index.get(str(e.get("target")), -1) for e in edges), dtype=np.int64, count=len(edges))
+        ok = np.flatnonzero((src >= 0) & (dst >= 0))
+        edge_keys: dict[str, None] = {}
+        for e in edges:
+            edge_keys.update(dict.fromkeys(e))
+        edge_keys.pop("source", None)
+        edge_keys.pop("target", None)
+        cols = {"source": pa.array(src[ok].astype(np.int32)), "target": pa.array(dst[ok].astype(np.int32))}
+        for k in edge_keys:
+            cols[k] = _column([edges[i].get(k) for i in ok.tolist()])
+        return cls(graph.get("meta", {}), node_table, pa.table(cols))
+
+    @classmethod
+    def from_columns(
+        cls, meta: dict, nodes: dict[str, object], source: np.ndarray, target: np.ndarray, edges: dict | None = None
+    ) -> ArrowGraph:
+        """
+        Tables straight from node columns (one value per node, in node order)
+        and edge endpoints as node positions, plus optional edge columns; the
+        builders use this instead of assembling one dict per node and edge.
+        """
+        cols = {
+            "source": pa.array(np.asarray(source).astype(np.int32)),
+            "target": pa.array(np.asarray(target).astype(np.int32)),
+        }
+        for k, v in (edges or {}).items():
+            cols[k] = _column(v)
+        return cls(meta, pa.table({k: _column(v) for k, v in nodes.items()}), pa.table(cols))
+
+    @property
+    def num_nodes(self) -> int:
+        return self.nodes.num_rows
+
+    @cached_property
+    def ids(self) -> list[str]:
+        if "id" not in self.nodes.column_names:
+            return []
+        return [str(x) for x in self.nodes.column("id").to_pylist()]
+
+    def positions(self) -> tuple[np.ndarray, np.ndarray]:
+        """(source, target) node positions as int64 arrays."""
+        src = self.edges.column("source").to_numpy().astype(np.int64)
+        dst = self.edges.column("target").to_numpy().astype(np.int64)
+        return src, dst
+
+    def iter_edge_rows(self, rows: np.ndarray | None = None, ids: list[str] | None = None) -> Iterator[dict]:
+        """Edges (all, or the given rows) as JSON objects with node ids as source/target, BATCH_ROWS at a time."""
+        ids = self.ids if ids is None else ids
+        for batch in _batches(self.edges, rows):
+            for e in batch:
+                e["source"] = ids[e["source"]]
+                e["target"] = ids[e["target"]]
+            yield from batch
+
+    def iter_node_rows(self, rows: np.ndarray | None = None) -> Iterator[dict]:
+        """Nodes (all, or the given rows) as JSON objects, BATCH_ROWS at a time."""
+        for batch in _batches(self.nodes, rows):
+            yield from batch
+
+    def edge_rows(self, rows: np.ndarray | None = None, ids: list[str] | None = None) -> list[dict]:
+        return list(self.iter_edge_rows(rows, ids))
+
+    def node_rows(self, rows: np.ndarray | None = None) -> list[dict]:
+        return list(self.iter_node_rows(rows))
+
+    def with_node_columns(self, columns: dict[str, np.ndarray], meta: dict | None = None) -> ArrowGraph:
+        """Copy with node columns added or replaced (and meta, if given)."""
+        nodes = self.nodes
+        for name, values in columns.items():
+            if name in nodes.column_names:
+                nodes = nodes.set_column(nodes.column_names.index(name), name, pa.array(values))
+            else:
+                nodes = nodes.append_column(name, pa.array(values))
+        return ArrowGraph(self.meta if meta is None else meta, nodes, self.edges)
+
+    def to_dict(self) -> dict:
+        """The graph JSON object (same shape the builders write)."""
+        return {"meta": self.meta, "nodes": self.node_rows(), "edges": self.edge_rows()}
+
+
+def _batches(table: pa.Table, rows: np.ndarray | None) -> Iterator[list[dict]]:
+    n = table.num_rows if rows is None else len(rows)
+    for lo in range(0, n, BATCH_ROWS):
+        if rows is None:
+            part = table.slice(lo, BATCH_ROWS)
+        else:
+            part = table.take(pa.array(rows[lo : lo + BATCH_ROWS], type=pa.int64()))
+        yield part.to_pylist()
+
+
+def graph_signature(g: ArrowGraph) -> str:
+    """Hash of what a layout depends on: node ids, communities and edge endpoints."""
+    h = hashlib.sha256()
+    h.update("\n".join(g.ids).encode("utf-8"))
+    if "community" in g.nodes.column_names:
+        h.update(g.nodes.column("community").fill_null(-1).to_numpy().astype(np.int64).tobytes())
+    for positions in g.positions():
+        h.update(positions.tobytes())
+    return h.hexdigest()[:32]
+
+
+def write_table(table: pa.Table, path: Path) -> None:
+    """Writes one Arrow IPC file (atomically: temp file, then rename)."""
+    tmp = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def write_graph(graph: dict | ArrowGraph, json_path: Path) -> None:
+    """Writes the Arrow companions of the graph output at json_path (not the JSON itself)."""
+    g = graph if isinstance(graph, ArrowGraph) else ArrowGraph.from_dict(graph)
+    nodes_path, edges_path = arrow_paths(Path(json_path))
+    metadata = {_META_KEY: json.dumps(g.meta, ensure_ascii=False).encode("utf-8"), _LAYOUT_KEY: str(ARROW_LAYOUT).encode()}
+    write_table(g.nodes.replace_schema_metadata(metadata), nodes_path)
+    write_table(g.edges, edges_path)
+
+
+def read_table(path: Path) -> pa.Table:
+    """Memory-mapped Arrow IPC file."""
+    # the mapping stays alive as long as the table's buffers do
+    return ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def read_graph(json_path: Path) -> ArrowGraph | None:
+    """The memory-mapped Arrow form of the graph output at json_path; None if absent or another layout."""
+    nodes_path, edges_path = arrow_paths(Path(json_path))
+    if not (nodes_path.exists() and edges_path.exists()):
+        return None
+    nodes = read_table(nodes_path)
+    metadata = nodes.schema.metadata or {}
+    if metadata.get(_LAYOUT_KEY) != str(ARROW_LAYOUT).encode():
+        return None
+    meta = json.loads(metadata.get(_META_KEY, b"{}"))
+    return ArrowGraph(meta, nodes.replace_schema_metadata(None), read_table(edges_path))
+
+
+def read_layout(json_path: Path, graph: ArrowGraph) -> tuple[dict, pa.Table, pa.Table] | None:
+    """
+    (params, node positions, edge control points) for the graph output at
+    json_path; None if not built, another layout version, or computed for
+    a different graph (e.g. left over from before a rebuild).
+    """
+    layout_path, bundles_path = layout_paths(Path(json_path))
+    if not (layout_path.exists() and bundles_path.exists()):
+        return None
+    nodes, edges = read_table(layout_path), read_table(bundles_path)
+    metadata = nodes.schema.metadata or {}
+    if metadata.get(_LAYOUT_KEY) != str(ARROW_LAYOUT).encode():
+        return None
+    if metadata.get(_GRAPH_KEY) != graph_signature(graph).encode():
+        return None
+    if nodes.num_rows != graph.num_nodes or edges.num_rows != graph.edges.num_rows:
+        return None
+    return json.loads(metadata.get(_META_KEY, b"{}")), nodes, edges
+
+
+def layout_metadata(params: dict, graph: ArrowGraph) -> dict[bytes, bytes]:
+    """Schema metadata of the layout tables (read back by read_layout)."""
+    return {
+        _META_KEY: json.dumps(params).encode("utf-8"),
+        _LAYOUT_KEY: str(ARROW_LAYOUT).encode(),
+        _GRAPH_KEY: graph_signature(graph).encode(),
+    }
+
+
+def load_graph(json_path: Path) -> ArrowGraph:
+    """The graph output at json_path, from its Arrow files if present, else parsed from JSON."""
+    g = read_graph(json_path)
+    if g is None:
+        g = ArrowGraph.from_dict(json.loads(Path(json_path).read_bytes()))
+    return g
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# SciSciNet v2 uses OpenAlex ids: a letter prefix for the entity type followed
+# by an integer ("W3108936441", "A5001221823"). The builders keep only the
+# integer part as int64 (filtering, joins, counting) and put the prefix back
+# when writing JSON. Tables that already store integer ids use prefix "".
+_ID_RE = re.compile(r"^([A-Za-z]*)(\d+)$")
+
+NULL_ID = -1
+
+
+@dataclass(frozen=True)
+class IdCodec:
+    prefix: str = ""
+
+    def encode(self, arr: pa.Array | pa.ChunkedArray) -> pa.Array | pa.ChunkedArray:
+        """Arrow id column (string or integer) -> int64, nulls as NULL_ID."""
+        typ = arr.type
+        if pa.types.is_dictionary(typ):
+            arr = pc.cast(arr, typ.value_type)
+            typ = typ.value_type
+        if not pa.types.is_integer(typ):
+            if self.prefix:
+                arr = pc.utf8_slice_codeunits(arr, len(self.prefix))
+        arr = pc.cast(arr, pa.int64())
+        return pc.fill_null(arr, NULL_ID)
+
+    def parse(self, values: Iterable[str]) -> np.ndarray:
+        return self.encode(pa.array([str(v) for v in values], pa.string())).to_numpy()
+
+    def decode(self, ids: Iterable[int]) -> list[str | None]:
+        ids = np.asarray(ids, dtype=np.int64).tolist()
+        return [None if i == NULL_ID else f"{self.prefix}{i}" for i in ids]
+
+    def value_set(self, ids: Iterable[int], typ: pa.DataType) -> pa.Array:
+        """int ids as an array matching a parquet column of type typ, for pushdown filters."""
+        if pa.types.is_dictionary(typ):
+            typ = typ.value_type
+        ids = np.asarray(ids, dtype=np.int64)
+        if pa.types.is_integer(typ):
+            return pa.array(ids).cast(typ)
+        return pa.array(self.decode(ids), pa.string()).cast(typ)
+
+
+def detect_codec(sample: pa.Array | pa.ChunkedArray) -> IdCodec:
+    if pa.types.is_integer(sample.type):
+        return IdCodec("")
+    for v in sample.drop_null().to_pylist():
+        m = _ID_RE.match(str(v))
+        if m is None:
+            raise ValueError(f"id {v!r} is not an integer or OpenAlex-style id")
+        return IdCodec(m.group(1))
+    return IdCodec("")
+
+
+def sorted_unique(ids: Iterable[int]) -> np.ndarray:
+    return np.unique(np.asarray(ids, dtype=np.int64))
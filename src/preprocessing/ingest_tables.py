@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import sys
+import json
+import math
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from ids import detect_codec
+from tables import INGEST_META, LOCAL_LAYOUT, file_signature, local_copy, local_path
+from instrument import record_run, stage
+
+RAW = REPO_ROOT / "data" / "raw"
+CACHE = REPO_ROOT / "data" / "cache"
+
+# Rewrites each fetched table into a local dataset (see tables.local_path)
+# sorted on the columns the builders filter it by, so row-group min/max
+# statistics are tight and filtered scans skip most of the file:
+#
+#   data/local/<table>/part-00000.parquet, part-00001.parquet, ..., _ingest.json
+#
+# Columns and types are unchanged. Tables larger than BUCKET_ROWS are sorted
+# out of core: one pass range-partitions rows on the first sort key into
+# bucket files, then each bucket is sorted in memory and appended in order.
+SORT_KEYS = {
+    "sciscinet_papers.parquet": ["year", "paperid"],
+    "sciscinet_paperrefs.parquet": ["citing_paperid", "cited_paperid"],
+    "sciscinet_fields.parquet": ["fieldid"],
+    "sciscinet_paperfields.parquet": ["fieldid", "paperid"],
+    "sciscinet_affiliations.parquet": ["institution_id"],
+    "sciscinet_paper_author_affiliation.parquet": ["paperid", "institutionid"],
+    "sciscinet_authors.parquet": ["authorid"],
+    "sciscinet_authors_paperid.parquet": ["paperid", "authorid"],
+}
+
+ROW_GROUP_ROWS = 1 << 17
+FILE_ROWS = 1 << 23
+BUCKET_ROWS = 1 << 24
+SAMPLE_ROW_GROUPS = 64
+COMPRESSION = "zstd"
+
+
+def key_values(col: pa.Array | pa.ChunkedArray) -> np.ndarray:
+    """Numeric form of a sort key: numbers as-is, prefixed ids by their number (see ids.py)."""
+    if pa.types.is_dictionary(col.type):
+        col = col.cast(col.type.value_type)
+    typ = col.type
+    if pa.types.is_integer(typ) or pa.types.is_floating(typ):
+        return np.asarray(pc.fill_null(col, -1).to_numpy(zero_copy_only=False))
+    sample = col.slice(0, 1000)
+    return np.asarray(detect_codec(sample).encode(col))
+
+
+def bucket_bounds(pf: pq.ParquetFile, key: str, buckets: int) -> np.ndarray:
+    """Quantiles of the first sort key over a sample of row groups."""
+    step = max(1, pf.num_row_groups // SAMPLE_ROW_GROUPS)
+    sample = np.concatenate(
+        [key_values(pf.read_row_group(i, columns=[key]).column(key)) for i in range(0, pf.num_row_groups, step)]
+    )
+    qs = np.quantile(sample, np.linspace(0, 1, buckets + 1)[1:-1])
+    return np.unique(qs)
+
+
+def sort_table(table: pa.Table, keys: list[str]) -> pa.Table:
+    # first key in numeric order (so "W9" < "W10"), the rest as stored
+    table = table.append_column("__key", pa.array(key_values(table.column(keys[0]))))
+    table = table.sort_by([("__key", "ascending")] + [(k, "ascending") for k in keys[1:]])
+    return table.drop_columns(["__key"])
+
+
+class PartWriter:
+    """Appends sorted tables as part-NNNNN.parquet files of at most FILE_ROWS rows."""
+
+    def __init__(self, out: Path, schema: pa.Schema) -> None:
+        self.out = out
+        self.schema = schema
+        self.parts = 0
+        self.rows = 0
+        self._writer: pq.ParquetWriter | None = None
+        self._in_file = 0
+
+    def write(self, table: pa.Table) -> None:
+        while table.num_rows:
+            if self._writer is None:
+                path = self.out / f"part-{self.parts:05d}.parquet"
+                self._writer = pq.ParquetWriter(path, self.schema, compression=COMPRESSION)
+                self.parts += 1
+                self._in_file = 0
+            take = min(table.num_rows, FILE_ROWS - self._in_file)
+            self._writer.write_table(table.slice(0, take), row_group_size=ROW_GROUP_ROWS)
+            self._in_file += take
+            self.rows += take
+            table = table.slice(take)
+            if self._in_file >= FILE_ROWS:
+                self.close()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def ingest(src: Path, keys: list[str], out: Path) -> dict:
+    pf = pq.ParquetFile(src)
+    schema = pf.schema_arrow
+    tmp = out.with_name(out.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    parts = PartWriter(tmp, schema)
+    n_buckets = math.ceil(pf.metadata.num_rows / BUCKET_ROWS)
+    if n_buckets <= 1:
+        parts.write(sort_table(pf.read(), keys))
+    else:
+        bounds = bucket_bounds(pf, keys[0], n_buckets)
+        bucket_dir = tmp / "_buckets"
+        bucket_dir.mkdir()
+        writers: dict[int, pa.RecordBatchStreamWriter] = {}
+        for batch in pf.iter_batches(batch_size=1 << 20):
+            idx = np.searchsorted(bounds, key_values(batch.column(keys[0])), side="right")
+            order = np.argsort(idx, kind="stable")
+            ids, starts = np.unique(idx[order], return_index=True)
+            batch = batch.take(pa.array(order))
+            for b, start, end in zip(ids.tolist(), starts, np.r_[starts[1:], len(order)]):
+                if b not in writers:
+                    writers[b] = pa.ipc.new_stream(str(bucket_dir / f"{b:05d}.arrow"), schema)
+                writers[b].write_batch(batch.slice(start, end - start))
+        for w in writers.values():
+            w.close()
+        for b in sorted(writers):
+            path = bucket_dir / f"{b:05d}.arrow"
+            with pa.memory_map(str(path), "r") as source:
+                parts.write(sort_table(pa.ipc.open_stream(source).read_all(), keys))
+            path.unlink()
+        bucket_dir.rmdir()
+    parts.close()
+
+    info = {
+        "source": file_signature(src),
+        "layout": LOCAL_LAYOUT,
+        "sort_by": keys,
+        "rows": parts.rows,
+        "files": parts.parts,
+        "row_group_rows": ROW_GROUP_ROWS,
+        "compression": COMPRESSION,
+    }
+    (tmp / INGEST_META).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    if out.exists():
+        shutil.rmtree(out)
+    tmp.rename(out)
+    return info
+
+
+def main() -> None:
+    force = "--force" in sys.argv[1:]
+    spans: dict[str, dict] = {}
+    for fname in SORT_KEYS:
+        src = RAW / fname
+        if not src.exists():
+            print(f"[skip] not found: {src}")
+            continue
+        if not force and local_copy(src) is not None:
+            print(f"OK (up to date): {fname}")
+            continue
+        with stage(fname) as span:
+            info = ingest(src, SORT_KEYS[fname], local_path(src))
+            span.rows(rows_in=info["rows"], rows_out=info["rows"])
+        spans[fname] = span.to_dict()
+        print(f"OK: {fname} | rows={info['rows']} files={info['files']} sort_by={','.join(info['sort_by'])}")
+    if spans:
+        record_run(CACHE, "ingest_tables", spans)
+
+
+if __name__ == "__main__":
+    main()
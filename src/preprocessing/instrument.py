@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import socket
+import resource
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+# Build instrumentation. A runner (pipeline stage, script main) opens a
+# `stage`; code below it marks its phases with `step` (or @timed). Each span
+# records wall seconds, optional rows in/out, current and peak RSS, and with
+# tracemalloc on (config instrument.tracemalloc, or SCISCINET_TRACEMALLOC=1)
+# the peak of Python/NumPy allocations inside it. Spans nest; a `step` with no
+# stage open is timed and dropped, so builders can be called from anywhere.
+#
+# Results go into each output's meta.build.<stage> (`attach`) and, one JSON
+# line per run, into data/cache/runs.jsonl (`record_run`).
+TRACE_ENV = "SCISCINET_TRACEMALLOC"
+RUN_LOG = "runs.jsonl"
+
+_MB = 1 << 20
+
+
+def rss_mb() -> float | None:
+    """Current resident set size (Linux), else None."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / _MB, 1)
+
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux, bytes on macOS
+    return round(peak / _MB if sys.platform == "darwin" else peak / 1024, 1)
+
+
+@dataclass
+class Span:
+    name: str
+    rows_in: int | None = None
+    rows_out: int | None = None
+    seconds: float = 0.0
+    rss_mb: float | None = None
+    peak_rss_mb: float = 0.0
+    traced_peak_mb: float | None = None
+    steps: list[Span] = field(default_factory=list)
+    _traced: int = 0
+
+    def rows(self, rows_in: int | None = None, rows_out: int | None = None) -> None:
+        if rows_in is not None:
+            self.rows_in = int(rows_in)
+        if rows_out is not None:
+            self.rows_out = int(rows_out)
+
+    def to_dict(self) -> dict:
+        d: dict[str, Any] = {"seconds": self.seconds}
+        for key in ("rows_in", "rows_out", "rss_mb", "peak_rss_mb", "traced_peak_mb"):
+            value = getattr(self, key)
+            if value is not None:
+                d[key] = value
+        if self.steps:
+            d["steps"] = {s.name: s.to_dict() for s in self.steps}
+        return d
+
+
+_stack: list[Span] = []
+
+
+@contextmanager
+def step(name: str, rows_in: int | None = None) -> Iterator[Span]:
+    """Times the enclosed block as a child of the innermost open span."""
+    span = Span(name, rows_in=None if rows_in is None else int(rows_in))
+    parent = _stack[-1] if _stack else None
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # keep the parent's peak so far, then measure this block from here
+        if parent is not None:
+            parent._traced = max(parent._traced, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    _stack.append(span)
+    t0 = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span.seconds = round(time.perf_counter() - t0, 4)
+        span.rss_mb = rss_mb()
+        span.peak_rss_mb = max(peak_rss_mb(), span.rss_mb or 0.0)  # ru_maxrss can lag statm
+        if tracing and tracemalloc.is_tracing():
+            span._traced = max(span._traced, tracemalloc.get_traced_memory()[1])
+            span.traced_peak_mb = round(span._traced / _MB, 1)
+            if parent is not None:
+                parent._traced = max(parent._traced, span._traced)
+        _stack.pop()
+        if parent is not None:
+            parent.steps.append(span)
+
+
+@contextmanager
+def stage(name: str, trace: bool = False) -> Iterator[Span]:
+    """Top-level span of a stage or script; starts tracemalloc for its duration if asked to (or TRACE_ENV is set)."""
+    trace = trace or os.environ.get(TRACE_ENV, "") not in ("", "0")
+    started = trace and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        with step(name) as span:
+            yield span
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def timed(name: str | None = None) -> Callable:
+    """Decorator form of `step`, named after the function by default."""
+
+    def wrap(fn: Callable) -> Callable:
+        @wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            with step(name or fn.__name__):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def trace_enabled(cfg: dict) -> bool:
+    """instrument.tracemalloc from the config."""
+    return bool((cfg.get("instrument") or {}).get("tracemalloc", False))
+
+
+def attach(outputs: dict[str, Any], span: Span) -> None:
+    """Stores the stage's span in meta.build.<stage> of every output it wrote."""
+    summary = span.to_dict()
+    for obj in outputs.values():
+        meta = obj.setdefault("meta", {}) if isinstance(obj, dict) else getattr(obj, "meta", None)  # or ArrowGraph
+        if meta is not None:  # Arrow tables (layout stage) carry no meta
+            meta.setdefault("build", {})[span.name] = summary
+
+
+def record_run(cache: Path, run: str, stages: dict[str, dict], **extra: Any) -> dict:
+    """Appends one run (stage spans as dicts) to cache/runs.jsonl and returns the record."""
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "run": run,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        **extra,
+        "seconds": round(sum(s.get("seconds", 0.0) for s in stages.values()), 4),
+        "peak_rss_mb": max((s.get("peak_rss_mb", 0.0) for s in stages.values()), default=0.0),
+        "stages": stages,
+    }
+    cache.mkdir(parents=True, exist_ok=True)
+    with (cache / RUN_LOG).open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
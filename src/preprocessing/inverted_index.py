@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+# Inverted indexes written by build_indexes.py, one directory per mapping
+# next to the raw directory (data/index/<name>/ for data/raw):
+#
+#   keys.i64     sorted distinct key ids                      (K,)
+#   offsets.i64  keys[i]'s values are values[offsets[i]:offsets[i+1]]  (K + 1,)
+#   values.i64   value ids, sorted and distinct within each key  (N,)
+#   index.json   layout, source file signature, columns, id prefixes, sizes
+#
+# Ids are the int64 form from ids.py. The arrays are raw little-endian int64
+# and are memory-mapped, so opening an index reads only index.json and a
+# lookup touches O(log K) pages of keys plus the value slice. This module
+# only needs numpy, so the API can import it as well.
+
+INDEX_DIR = "index"
+INDEX_LAYOUT = 1
+INDEX_META = "index.json"
+DTYPE = np.dtype("<i8")
+
+# name -> (table, key column, value column)
+INDEXES = {
+    "institution_papers": ("sciscinet_paper_author_affiliation.parquet", "institutionid", "paperid"),
+    "field_papers": ("sciscinet_paperfields.parquet", "fieldid", "paperid"),
+    "author_papers": ("sciscinet_authors_paperid.parquet", "authorid", "paperid"),
+}
+
+
+def index_path(raw: str | Path, name: str) -> Path:
+    return Path(raw).parent / INDEX_DIR / name
+
+
+def source_signature(path: str | Path) -> list[int]:
+    # same as tables.file_signature; the index depends only on the raw rows
+    st = Path(path).stat()
+    return [st.st_size, int(st.st_mtime)]
+
+
+def _map(path: Path, count: int) -> np.ndarray:
+    if count == 0:
+        return np.zeros(0, dtype=DTYPE)
+    return np.memmap(path, dtype=DTYPE, mode="r", shape=(count,))
+
+
+class InvertedIndex:
+    """Read-only key -> sorted value ids lookups over a memory-mapped CSR index."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.meta = json.loads((self.path / INDEX_META).read_text(encoding="utf-8"))
+        n_keys, n_values = int(self.meta["keys"]), int(self.meta["values"])
+        self.keys = _map(self.path / "keys.i64", n_keys)
+        self.offsets = _map(self.path / "offsets.i64", n_keys + 1) if n_keys else np.zeros(1, dtype=DTYPE)
+        self.values = _map(self.path / "values.i64", n_values)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: int) -> bool:
+        return self._slot(int(key)) >= 0
+
+    def _slot(self, key: int) -> int:
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and int(self.keys[i]) == key else -1
+
+    def lookup(self, key: int) -> np.ndarray:
+        """Sorted value ids for key (empty if the key is absent)."""
+        i = self._slot(int(key))
+        if i < 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.values[self.offsets[i] : self.offsets[i + 1]], dtype=np.int64)
+
+    def count(self, key: int) -> int:
+        i = self._slot(int(key))
+        return 0 if i < 0 else int(self.offsets[i + 1] - self.offsets[i])
+
+    def lookup_many(self, keys: Iterable[int]) -> np.ndarray:
+        """Sorted distinct value ids of any of keys."""
+        parts = [self.lookup(k) for k in np.unique(np.asarray(list(keys), dtype=np.int64))]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def shared(self, a: int, b: int) -> np.ndarray:
+        """Sorted value ids of both a and b, e.g. the papers two authors share."""
+        return np.intersect1d(self.lookup(a), self.lookup(b), assume_unique=True)
+
+    def parse_key(self, key: str | int) -> int:
+        """OpenAlex-style or integer key id -> int64 form."""
+        s = str(key)
+        prefix = self.meta.get("key_prefix", "")
+        return int(s[len(prefix) :] if prefix and s.startswith(prefix) else s)
+
+    def format_values(self, ids: Iterable[int]) -> list[str]:
+        prefix = self.meta.get("value_prefix", "")
+        return [f"{prefix}{int(i)}" for i in ids]
+
+
+def open_index(raw: str | Path, name: str) -> InvertedIndex | None:
+    """The index for name if it has been built and still matches its raw table, else None."""
+    path = index_path(raw, name)
+    meta = path / INDEX_META
+    if not meta.exists():
+        return None
+    info = json.loads(meta.read_text(encoding="utf-8"))
+    if info.get("layout") != INDEX_LAYOUT:
+        return None
+    src = Path(raw) / INDEXES[name][0]
+    if src.exists() and info.get("source") != source_signature(src):
+        return None
+    return InvertedIndex(path)
@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import pyarrow as pa
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+import tables
+from utils import load_config, write_json, write_output
+from graph_arrow import GRAPH_OUTPUTS, ArrowGraph, companion_files, load_graph
+from instrument import attach, record_run, stage, step, trace_enabled
+from snapshots import current_dir, new_snapshot, publish
+from cohort import Cohort, COHORT_TABLES, cohort_key, raw_signature, load_cohort
+import build_paper_graph
+import build_author_graph
+import build_t2_dashboards
+import add_communities
+import build_layout
+
+RAW = REPO_ROOT / "data" / "raw"
+OUT = REPO_ROOT / "data" / "outputs"
+CACHE = REPO_ROOT / "data" / "cache"
+MANIFEST = CACHE / "pipeline.json"
+
+# All builders behind one entry point. Stages form a DAG; each has a fingerprint
+# over everything that decides its outputs:
+#
+#   config keys it reads + raw tables it scans (size, mtime)
+#   + source of the modules it runs + fingerprints of its upstream stages
+#
+# A stage is skipped when its fingerprint matches the manifest of the last
+# run and its outputs in the live snapshot are still the files that run
+# wrote. Independent stage groups run in parallel processes; whatever runs
+# is written into one new snapshot, published once. Optional stages (enabled_by)
+# only take part when their config section has `enabled: true`.
+
+COHORT_MODULES = ["cohort.py", "tables.py", "ids.py", "utils.py"]
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    outputs: list[str]
+    run: Callable[["Context"], dict[str, dict | ArrowGraph | pa.Table]]  # -> {output file name: object, graph or table}
+    deps: list[str] = field(default_factory=list)
+    config_keys: list[str] = field(default_factory=list)
+    tables: list[str] = field(default_factory=list)
+    modules: list[str] = field(default_factory=list)
+    uses_cohort: bool = True
+    enabled_by: str | None = None  # config section whose `enabled` turns the stage on
+
+
+def stage_enabled(s: Stage, cfg: dict) -> bool:
+    return s.enabled_by is None or bool((cfg.get(s.enabled_by) or {}).get("enabled", False))
+
+
+class Context:
+    """
+    State shared by the stages of one run: config, cohort, outputs built so
+    far, and raw tables already scanned for them (`shared`, see batch.py).
+    """
+
+    def __init__(
+        self,
+        cfg: dict,
+        raw: Path = RAW,
+        cache: Path = CACHE,
+        out: Path = OUT,
+        cohort: Cohort | None = None,
+        shared: dict | None = None,
+    ) -> None:
+        self.cfg = cfg
+        self.raw = raw
+        self.cache = cache
+        self.out = out
+        self.results: dict[str, dict | ArrowGraph | pa.Table] = {}
+        self.shared = shared or {}
+        self._cohort = cohort
+
+    @property
+    def cohort(self) -> Cohort:
+        # loaded on first use, so a run where every stage is fresh never reads it
+        if self._cohort is None:
+            with step("cohort"):
+                self._cohort = load_cohort(self.cfg, self.raw, self.cache)
+        return self._cohort
+
+    def output(self, name: str) -> dict | ArrowGraph:
+        """
+        An output built earlier in this run, else the one in the live snapshot
+        (graphs memory-mapped from their Arrow files, see graph_arrow.py).
+        """
+        if name not in self.results:
+            path = current_dir(self.out) / name
+            if name in GRAPH_OUTPUTS:
+                self.results[name] = load_graph(path)
+            else:
+                self.results[name] = json.loads(path.read_text(encoding="utf-8"))
+        return self.results[name]
+
+
+def _communities(name: str) -> Callable[[Context], dict[str, ArrowGraph]]:
+    def run(ctx: Context) -> dict[str, ArrowGraph]:
+        engine, seed, resolution = add_communities.community_params(ctx.cfg)
+        return {name: add_communities.add_fields(ctx.output(name), engine, seed, resolution)}
+
+    return run
+
+
+def _layout(name: str) -> Callable[[Context], dict[str, pa.Table]]:
+    def run(ctx: Context) -> dict[str, pa.Table]:
+        return build_layout.layout_outputs(name, ctx.output(name), ctx.cfg)
+
+    return run
+
+
+STAGES = [
+    Stage(
+        "papers_graph",
+        ["papers_graph.json"],
+        lambda ctx: {
+            "papers_graph.json": build_paper_graph.build_graph(ctx.cfg, ctx.cohort, ctx.raw, refs=ctx.shared.get("refs"))
+        },
+        config_keys=["year_from", "year_to", "field_keywords", "institution_whitelist", "paper_graph"],
+        tables=["sciscinet_paperrefs.parquet"],
+        modules=["build_paper_graph.py", "selection.py", "tables.py", "ids.py", "graph_arrow.py"],
+    ),
+    Stage(
+        "papers_communities",
+        ["papers_graph.json"],
+        _communities("papers_graph.json"),
+        deps=["papers_graph"],
+        config_keys=["communities"],
+        modules=["add_communities.py", "communities.py", "graph_arrow.py"],
+        uses_cohort=False,
+    ),
+    Stage(
+        "authors_graph",
+        ["authors_graph.json", "authors_graph_papers.json"],
+        lambda ctx: build_author_graph.build_outputs(
+            ctx.cfg,
+            ctx.cohort,
+            ctx.raw,
+            author_papers=ctx.shared.get("author_papers"),
+            authors=ctx.shared.get("authors"),
+        ),
+        config_keys=[
+            "year_from",
+            "year_to",
+            "field_keywords",
+            "university_keywords",
+            "institution_whitelist",
+            "author_graph",
+        ],
+        tables=["sciscinet_authors_paperid.parquet", "sciscinet_authors.parquet"],
+        modules=["build_author_graph.py", "coauthor.py", "tables.py", "ids.py", "graph_arrow.py"],
+    ),
+    Stage(
+        "authors_communities",
+        ["authors_graph.json"],
+        _communities("authors_graph.json"),
+        deps=["authors_graph"],
+        config_keys=["communities"],
+        modules=["add_communities.py", "communities.py", "graph_arrow.py"],
+        uses_cohort=False,
+    ),
+    Stage(
+        "t2_dashboards",
+        ["t2_timeline.json", "t2_patent_counts_by_year.json"],
+        lambda ctx: build_t2_dashboards.build_dashboards(ctx.cfg, ctx.cohort),
+        config_keys=["year_to", "field_keywords", "institution_whitelist"],
+        modules=["build_t2_dashboards.py"],
+    ),
+    Stage(
+        "papers_layout",
+        ["papers_graph.layout.arrow", "papers_graph.bundles.arrow"],
+        _layout("papers_graph.json"),
+        deps=["papers_communities"],
+        config_keys=["layout"],
+        modules=["build_layout.py", "graph_arrow.py"],
+        uses_cohort=False,
+        enabled_by="layout",
+    ),
+    Stage(
+        "authors_layout",
+        ["authors_graph.layout.arrow", "authors_graph.bundles.arrow"],
+        _layout("authors_graph.json"),
+        deps=["authors_communities"],
+        config_keys=["layout"],
+        modules=["build_layout.py", "graph_arrow.py"],
+        uses_cohort=False,
+        enabled_by="layout",
+    ),
+]
+
+
+def topo_order(stages: list[Stage]) -> list[Stage]:
+    by_name = {s.name: s for s in stages}
+    order: list[Stage] = []
+    state: dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(name: str) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError(f"pipeline stages have a cycle through {name!r}")
+        if name not in by_name:
+            raise ValueError(f"unknown pipeline stage {name!r}")
+        state[name] = 1
+        for dep in by_name[name].deps:
+            visit(dep)
+        state[name] = 2
+        order.append(by_name[name])
+
+    for s in stages:
+        visit(s.name)
+    return order
+
+
+def _digest(obj: object) -> str:
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def code_version(modules: list[str]) -> str:
+    h = hashlib.sha256()
+    for name in sorted(set(modules)):
+        h.update(name.encode("utf-8"))
+        h.update((THIS_DIR / name).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def cohort_fingerprint(cfg: dict, raw: Path) -> str:
+    return _digest(
+        {
+            "key": cohort_key(cfg),
+            "raw": raw_signature(raw, COHORT_TABLES),
+            "code": code_version(COHORT_MODULES),
+        }
+    )
+
+
+def fingerprints(stages: list[Stage], cfg: dict, raw: Path) -> dict[str, str]:
+    cohort_fp = cohort_fingerprint(cfg, raw)
+    fps: dict[str, str] = {}
+    for s in topo_order(stages):
+        fps[s.name] = _digest(
+            {
+                "stage": s.name,
+                "config": {k: cfg.get(k) for k in s.config_keys},
+                "raw": raw_signature(raw, s.tables),
+                "code": code_version(s.modules),
+                "cohort": cohort_fp if s.uses_cohort else None,
+                "deps": [fps[d] for d in s.deps],
+            }
+        )
+    return fps
+
+
+def file_identity(path: Path) -> list[int] | None:
+    # snapshots hard-link unchanged files, so an output that was not rebuilt
+    # keeps inode/size/mtime across snapshots; anything else is a rewrite
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def read_manifest(path: Path = MANIFEST) -> dict:
+    if not path.exists():
+        return {"stages": {}, "files": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def is_fresh(stage: Stage, fp: str, manifest: dict, live: Path) -> bool:
+    if manifest["stages"].get(stage.name) != fp:
+        return False
+    for name in stage.outputs:
+        ident = file_identity(live / name)
+        if ident is None or manifest["files"].get(name) != ident:
+            return False
+        if not all((live / c).exists() for c in companion_files(name)):
+            return False
+    return True
+
+
+def plan(
+    stages: list[Stage], fps: dict[str, str], manifest: dict, live: Path, force: set[str] | None = None
+) -> list[Stage]:
+    """Stages to run, in order: stale or forced ones, plus everything downstream of them."""
+    force = force or set()
+    todo: list[Stage] = []
+    ran: set[str] = set()
+    for s in topo_order(stages):
+        if s.name in force or any(d in ran for d in s.deps) or not is_fresh(s, fps[s.name], manifest, live):
+            todo.append(s)
+            ran.add(s.name)
+    return todo
+
+
+def stage_groups(todo: list[Stage]) -> list[list[Stage]]:
+    """
+    Splits the stages to run into independent groups: stages linked by a
+    dependency (or writing the same output) stay in one group, in order, so
+    only unrelated work runs concurrently.
+    """
+    groups: list[list[Stage]] = []
+    for s in todo:
+        linked = [g for g in groups if any(t.name in s.deps or set(t.outputs) & set(s.outputs) for t in g)]
+        merged = [t for g in linked for t in g] + [s]
+        groups = [g for g in groups if g not in linked] + [sorted(merged, key=todo.index)]
+    return groups
+
+
+def run_group(names: list[str], ctx: Context, snap: Path) -> dict[str, dict]:
+    """
+    Runs the named stages in order and writes their outputs into snap;
+    returns each stage's instrumentation (also stored in its outputs' meta.build).
+    """
+    by_name = {s.name: s for s in STAGES}
+    spans: dict[str, dict] = {}
+    for name in names:
+        with stage(name, trace_enabled(ctx.cfg)) as span:
+            outputs = by_name[name].run(ctx)
+        attach(outputs, span)
+        ctx.results.update(outputs)
+        spans[name] = span.to_dict()
+    for name in sorted({o for n in names for o in by_name[n].outputs}):
+        write_output(ctx.results[name], snap / name)
+    return spans
+
+
+def _init_worker(scan_threads: int) -> None:
+    tables.SCAN_WORKERS = scan_threads
+
+
+def _run_group_worker(names: list[str], cfg: dict, raw: Path, cache: Path, out: Path, snap: Path) -> dict[str, dict]:
+    # the cohort artifact already exists (built by the parent) and is memory-mapped here
+    return run_group(names, Context(cfg, raw, cache, out), snap)
+
+
+def plan_pipeline(
+    cfg: dict, raw: Path = RAW, out: Path = OUT, manifest_path: Path = MANIFEST, force: set[str] | None = None
+) -> tuple[dict[str, str], dict, list[Stage]]:
+    """(fingerprints, manifest, stages to run) for cfg against the live outputs in out."""
+    manifest = read_manifest(manifest_path)
+    stages = [s for s in STAGES if stage_enabled(s, cfg)]
+    fps = fingerprints(stages, cfg, raw)
+    return fps, manifest, plan(stages, fps, manifest, current_dir(out), force)
+
+
+def run_pipeline(
+    cfg: dict,
+    raw: Path = RAW,
+    cache: Path = CACHE,
+    out: Path = OUT,
+    force: set[str] | None = None,
+    dry_run: bool = False,
+    workers: int = 0,
+    manifest_path: Path | None = None,
+    ctx: Context | None = None,
+) -> list[str]:
+    """
+    Runs the stale stages; returns the names of the stages that ran.
+    Independent groups of stages run in a process pool of up to `workers`
+    processes (0 = all cores), each scanning with its share of the cores.
+    A given ctx (preloaded cohort / shared tables) runs in this process.
+    """
+    manifest_path = manifest_path or cache / MANIFEST.name
+    fps, manifest, todo = plan_pipeline(cfg, raw, out, manifest_path, force)
+    ran = [s.name for s in todo]
+
+    for s in topo_order(STAGES):
+        if not stage_enabled(s, cfg):
+            print(f"[skip] {s.name} (disabled: {s.enabled_by}.enabled is false)")
+        elif s.name not in ran:
+            print(f"[skip] {s.name} (up to date)")
+    if dry_run or not todo:
+        for name in ran:
+            print(f"[plan] {name}")
+        return ran
+
+    groups = stage_groups(todo)
+    workers = 1 if ctx is not None else workers or os.cpu_count() or 1
+    procs = min(workers, len(groups))
+
+    ctx = ctx or Context(cfg, raw, cache, out)
+    if procs > 1 and any(s.uses_cohort for s in todo):
+        ctx.cohort  # build/refresh the cohort artifact once, before the workers read it
+
+    out.mkdir(parents=True, exist_ok=True)
+    snap = new_snapshot(out)
+    spans: dict[str, dict] = {}
+    try:
+        if procs > 1:
+            # spawn, not fork: the parent already runs Arrow thread pools
+            with ProcessPoolExecutor(
+                max_workers=procs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(max(1, workers // procs),),
+            ) as pool:
+                futures = [
+                    pool.submit(_run_group_worker, [s.name for s in g], cfg, raw, cache, out, snap) for g in groups
+                ]
+                for fut in as_completed(futures):
+                    for name, span in fut.result().items():
+                        spans[name] = span
+                        print(f"[run] {name} | {span['seconds']:.2f}s peak_rss={span['peak_rss_mb']:.0f}MB")
+        else:
+            for g in groups:
+                for name, span in run_group([s.name for s in g], ctx, snap).items():
+                    spans[name] = span
+                    print(f"[run] {name} | {span['seconds']:.2f}s peak_rss={span['peak_rss_mb']:.0f}MB")
+    except BaseException:
+        shutil.rmtree(snap, ignore_errors=True)
+        raise
+
+    written = sorted({name for s in todo for name in s.outputs})
+    for s in todo:
+        manifest["stages"][s.name] = fps[s.name]
+    for name in written:
+        manifest["files"][name] = file_identity(snap / name)
+    publish(out, snap)
+    write_json(manifest, manifest_path)
+    record_run(cache, "pipeline", spans, snapshot=snap.name, out=str(out), processes=procs)
+
+    print(f"[OK] snapshot {snap.name} | wrote {', '.join(written)} | processes={procs}")
+    return ran
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    names = {s.name for s in STAGES}
+
+    workers = int((cfg.get("pipeline") or {}).get("workers", 0) or 0)
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        args = args[:i] + args[i + 2 :]
+
+    force = {a for a in args if not a.startswith("--")}
+    unknown = force - names
+    if unknown:
+        print(f"[ERROR] unknown stage(s): {', '.join(sorted(unknown))}; expected {', '.join(sorted(names))}")
+        sys.exit(2)
+    disabled = sorted(s.name for s in STAGES if s.name in force and not stage_enabled(s, cfg))
+    if disabled:
+        print(f"[ERROR] disabled stage(s): {', '.join(disabled)}; enable them in configs/config.yaml")
+        sys.exit(2)
+    if "--force" in args:
+        force = names
+
+    run_pipeline(cfg, force=force, dry_run="--dry-run" in args, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
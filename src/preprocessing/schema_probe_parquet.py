@@ -1,6 +1,33 @@
+from __future__ import annotations
+
+import sys
 from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import write_json
+from catalog import CATALOG_VERSION, catalog_path, gee_distinct, read_catalog
+from tables import local_copy, open_dataset, table_signature
+from instrument import record_run, stage
+
+RAW = REPO_ROOT / "data" / "raw"
+
 FILES = [
     "sciscinet_papers.parquet",
     "sciscinet_paperrefs.parquet",
@@ -12,14 +39,128 @@ FILES = [
     "sciscinet_authors_paperid.parquet",
 ]
 
+# Per row group, min/max/nulls come from the parquet footer statistics, so
+# most of the table is never decoded. Distinct counts are computed for the
+# filter/join key columns only (ids and year), from a sample of row groups:
+# exactly for each sampled row group (the footer's count, if any, for the
+# rest), and for the whole table estimated from the sample.
+SAMPLE_ROW_GROUPS = 32
+
+
+def is_key_column(name: str) -> bool:
+    return name == "year" or name.endswith("id")
+
+
+def _plain(v: object) -> object:
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    if isinstance(v, (np.generic,)):
+        return v.item()
+    if isinstance(v, (str, int, float, bool)) or v is None:
+        return v
+    return str(v)
+
+
+def table_entry(path: Path) -> dict:
+    """Catalog entry for one table (its local copy if one is in use)."""
+    dataset = open_dataset(path)
+    keys = [c for c in dataset.schema.names if is_key_column(c)]
+    row_groups: list[dict] = []
+    samples: dict[str, list[pa.Array]] = {k: [] for k in keys}
+    sample_rows = 0
+
+    for f in dataset.files:
+        pf = pq.ParquetFile(f)
+        md = pf.metadata
+        step = max(1, md.num_row_groups // SAMPLE_ROW_GROUPS)
+        for i in range(md.num_row_groups):
+            rg = md.row_group(i)
+            sampled = bool(keys) and i % step == 0
+            key_table = pf.read_row_group(i, columns=keys) if sampled else None
+            cols = {}
+            for j in range(rg.num_columns):
+                c = rg.column(j)
+                name = c.path_in_schema
+                st = c.statistics
+                cols[name] = {
+                    "min": _plain(st.min) if st is not None and st.has_min_max else None,
+                    "max": _plain(st.max) if st is not None and st.has_min_max else None,
+                    "nulls": st.null_count if st is not None and st.has_null_count else None,
+                    "distinct": (
+                        pc.count_distinct(key_table.column(name)).as_py()
+                        if key_table is not None and name in keys
+                        else st.distinct_count if st is not None and st.has_distinct_count else None
+                    ),
+                    "bytes": c.total_compressed_size,
+                }
+            row_groups.append(
+                {
+                    "file": Path(f).name,
+                    "id": i,
+                    "rows": rg.num_rows,
+                    "bytes": sum(rg.column(j).total_compressed_size for j in range(rg.num_columns)),
+                    "columns": cols,
+                }
+            )
+            if key_table is not None:
+                for k in keys:
+                    samples[k].append(key_table.column(k).combine_chunks())
+                sample_rows += rg.num_rows
+
+    rows = sum(rg["rows"] for rg in row_groups)
+    columns = {}
+    for name in dataset.schema.names:
+        per_rg = [rg["columns"].get(name) or {} for rg in row_groups]
+        nulls = [c.get("nulls") for c in per_rg]
+        distinct = None
+        if name in samples and samples[name]:
+            counts = pc.value_counts(pa.chunked_array(samples[name]).combine_chunks().drop_null())
+            distinct = gee_distinct(counts.field("counts").to_numpy(), sample_rows, rows)
+        columns[name] = {
+            "nulls": None if None in nulls else int(sum(nulls)),
+            "distinct": distinct,
+            "bytes": int(sum(c.get("bytes") or 0 for c in per_rg)),
+        }
+
+    return {
+        "signature": table_signature(path),
+        "location": "local" if local_copy(path) is not None else "raw",
+        "rows": rows,
+        "bytes": int(sum(rg["bytes"] for rg in row_groups)),
+        "columns": columns,
+        "row_groups": row_groups,
+    }
+
+
 def main() -> None:
+    out = catalog_path(RAW / FILES[0])
+    cat = read_catalog(out)
+    tables = dict(cat.get("tables", {})) if cat.get("version") == CATALOG_VERSION else {}
+    spans: dict[str, dict] = {}
+
     for fname in FILES:
-        path = Path("data/raw") / fname
+        path = RAW / fname
         print("\n===", fname, "===")
-        pf = pq.ParquetFile(path)
-        cols = [f.name for f in pf.schema_arrow]
-        print("num_row_groups:", pf.num_row_groups)
-        print("columns:", cols)
+        if not path.exists() and local_copy(path) is None:
+            print("[skip] not found")
+            continue
+        with stage(fname) as span:
+            entry = table_entry(path)
+            span.rows(rows_in=entry["rows"])
+        spans[fname] = span.to_dict()
+        tables[fname] = entry
+        print("location:", entry["location"])
+        print("num_row_groups:", len(entry["row_groups"]))
+        print("rows:", entry["rows"], "| bytes:", entry["bytes"])
+        print("columns:", list(entry["columns"]))
+        for name, c in entry["columns"].items():
+            if c["distinct"] is not None:
+                print(f"  {name}: ~{c['distinct']} distinct, {c['nulls']} nulls")
+
+    write_json({"version": CATALOG_VERSION, "tables": tables}, out)
+    record_run(out.parent, "catalog", spans)
+    print(f"\n[OK] catalog: {out}")
+
 
 if __name__ == "__main__":
     main()
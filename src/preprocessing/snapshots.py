@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import json
+import fcntl
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+# Build outputs are published as versioned snapshots:
+#
+#   data/outputs/snapshots/<version>/*.json (+ *.arrow, see graph_arrow.py)
+#   data/outputs/CURRENT              (name of the live snapshot)
+#
+# A builder opens a new snapshot (seeded with the files of the live one, so
+# outputs it does not rebuild carry over), writes into it, then publishes it
+# by atomically replacing CURRENT. Readers never see a half-written snapshot.
+# Without CURRENT, the flat files in data/outputs are the live outputs.
+#
+# Builders may run at once. Seeding, publishing and pruning hold an exclusive
+# lock on data/outputs/.lock; if another builder published since this one was
+# seeded, publish first re-seeds every file this builder did not rewrite from
+# the new live snapshot, so neither builder's outputs are lost. A snapshot
+# being written carries a BUILDING marker (seed version + identities of the
+# seeded files) until it is published; prune never deletes those.
+
+POINTER = "CURRENT"
+SNAPSHOTS = "snapshots"
+KEEP = 3
+OUTPUT_PATTERNS = ("*.json", "*.arrow")
+LOCK = ".lock"
+BUILDING = ".building"
+
+
+def current_version(out: Path) -> str | None:
+    pointer = out / POINTER
+    if not pointer.exists():
+        return None
+    version = pointer.read_text(encoding="utf-8").strip()
+    return version or None
+
+
+def current_dir(out: Path) -> Path:
+    version = current_version(out)
+    if version is None:
+        return out
+    return out / SNAPSHOTS / version
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    # Files are only ever replaced (write to temp + rename), never modified
+    # in place, so hard links between snapshots are safe.
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+@contextmanager
+def locked(out: Path) -> Iterator[None]:
+    """Exclusive lock on the output directory (blocks until other builders release it)."""
+    out.mkdir(parents=True, exist_ok=True)
+    with (out / LOCK).open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _identity(path: Path) -> list[int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _seed(snap: Path, base: Path, seeded: dict[str, list[int]]) -> None:
+    """Links base's outputs into snap, except files snap has rewritten since it was seeded."""
+    for pattern in OUTPUT_PATTERNS:
+        for src in base.glob(pattern):
+            dst = snap / src.name
+            ident = _identity(dst)
+            if ident is not None and ident != seeded.get(src.name):
+                continue  # written by this builder
+            tmp = dst.with_name(dst.name + ".seed")
+            tmp.unlink(missing_ok=True)
+            _link_or_copy(src, tmp)
+            os.replace(tmp, dst)
+
+
+def new_snapshot(out: Path) -> Path:
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S-%f") + "-" + uuid.uuid4().hex[:6]
+    snap = out / SNAPSHOTS / version
+    with locked(out):
+        snap.mkdir(parents=True)
+        (snap / BUILDING).write_text("{}", encoding="utf-8")  # before any file, so prune skips it
+        _seed(snap, current_dir(out), {})
+        seeded = {p.name: _identity(p) for pattern in OUTPUT_PATTERNS for p in snap.glob(pattern)}
+        marker = {"base": current_version(out), "seeded": seeded}
+        (snap / BUILDING).write_text(json.dumps(marker), encoding="utf-8")
+    return snap
+
+
+def publish(out: Path, snap: Path, keep: int = KEEP) -> None:
+    with locked(out):
+        marker = json.loads((snap / BUILDING).read_text(encoding="utf-8"))
+        if current_version(out) != marker["base"]:
+            # another builder published meanwhile: carry its outputs over
+            _seed(snap, current_dir(out), marker["seeded"])
+        (snap / BUILDING).unlink()
+        tmp = out / (POINTER + ".tmp")
+        tmp.write_text(snap.name + "\n", encoding="utf-8")
+        os.replace(tmp, out / POINTER)
+        prune(out, keep)
+
+
+@contextmanager
+def building(out: Path) -> Iterator[Path]:
+    """A new snapshot, published when the block completes and deleted if it raises."""
+    out.mkdir(parents=True, exist_ok=True)
+    snap = new_snapshot(out)
+    try:
+        yield snap
+    except BaseException:
+        shutil.rmtree(snap, ignore_errors=True)  # its marker would keep prune off it for good
+        raise
+    publish(out, snap)
+
+
+def prune(out: Path, keep: int = KEEP) -> None:
+    """Deletes published snapshots older than the newest `keep`; never the live one or one being written."""
+    root = out / SNAPSHOTS
+    live = current_version(out)
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not (p / BUILDING).exists())
+    for old in versions[:-keep]:
+        if old.name != live:
+            shutil.rmtree(old, ignore_errors=True)
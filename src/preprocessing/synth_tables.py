@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import sys
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+THIS_DIR = Path(__file__).resolve().parent
+
+
+def find_repo_root(start: Path) -> Path:
+    for p in [start] + list(start.parents):
+        if (p / "configs" / "config.yaml").exists() or (p / ".git").exists():
+            return p
+    return Path.cwd()
+
+
+REPO_ROOT = find_repo_root(THIS_DIR)
+sys.path.insert(0, str(THIS_DIR))
+
+from utils import load_config
+
+BENCH = REPO_ROOT / "data" / "bench"
+
+# Synthetic stand-ins for the eight SciSciNet tables (fetch_tables.FILES),
+# with the columns the builders read and OpenAlex-style string ids, so the
+# pipeline and API can be run and measured without the real data:
+#
+#   data/bench/<scale>/raw/<table>.parquet, _synth.json
+#
+# Distributions are heavy-tailed where the real ones are: authors per paper,
+# papers per author, citations per paper (preferential attachment) and
+# institution sizes; paper counts grow towards recent years. Names from the
+# config (field keywords, university keywords, institution whitelist) are
+# planted among mid-ranked fields/institutions so the default cohort is
+# non-empty at every scale. Everything is generated in chunks of papers, so
+# memory stays flat as the scale grows. Same scale + seed -> same files.
+SCALES = {
+    "tiny": 20_000,
+    "small": 200_000,
+    "medium": 2_000_000,
+    "large": 20_000_000,
+}
+SYNTH_META = "_synth.json"
+SYNTH_VERSION = 1
+CHUNK_PAPERS = 1 << 19
+ROW_GROUP_ROWS = 1 << 16
+
+PAPER_BASE = 4_000_000_000
+AUTHOR_BASE = 5_000_000_000
+
+AUTHORS_PER_PAPER = 0.5  # distinct authors per paper in the corpus
+MAX_AUTHORS = 1000  # hyper-authored papers are capped here
+MEAN_REFS = 12
+N_FIELDS = 300
+TOP_FIELDS = [
+    "Medicine",
+    "Computer Science",
+    "Biology",
+    "Physics",
+    "Chemistry",
+    "Engineering",
+    "Mathematics",
+    "Psychology",
+    "Materials Science",
+    "Economics",
+    "Sociology",
+    "Environmental Science",
+    "Geography",
+    "Business",
+    "Political Science",
+    "Art",
+    "Philosophy",
+    "History",
+    "Geology",
+]
+DOCTYPES = ["article", "preprint", "book-chapter", "dataset", None]
+DOCTYPE_P = [0.7, 0.1, 0.05, 0.03, 0.12]
+
+SCHEMAS = {
+    "sciscinet_papers.parquet": pa.schema(
+        [
+            ("paperid", pa.string()),
+            ("doi", pa.string()),
+            ("year", pa.int64()),
+            ("doctype", pa.string()),
+            ("citation_count", pa.int64()),
+            ("patent_count", pa.int64()),
+        ]
+    ),
+    "sciscinet_paperrefs.parquet": pa.schema([("citing_paperid", pa.string()), ("cited_paperid", pa.string())]),
+    "sciscinet_fields.parquet": pa.schema([("fieldid", pa.string()), ("display_name", pa.string())]),
+    "sciscinet_paperfields.parquet": pa.schema([("paperid", pa.string()), ("fieldid", pa.string())]),
+    "sciscinet_affiliations.parquet": pa.schema([("institution_id", pa.string()), ("display_name", pa.string())]),
+    "sciscinet_paper_author_affiliation.parquet": pa.schema(
+        [("paperid", pa.string()), ("authorid", pa.string()), ("institutionid", pa.string())]
+    ),
+    "sciscinet_authors.parquet": pa.schema(
+        [
+            ("authorid", pa.string()),
+            ("display_name", pa.string()),
+            ("h_index", pa.int64()),
+            ("productivity", pa.int64()),
+        ]
+    ),
+    "sciscinet_authors_paperid.parquet": pa.schema([("authorid", pa.string()), ("paperid", pa.string())]),
+}
+
+
+def id_strings(prefix: str, ids: np.ndarray) -> pa.Array:
+    return pc.binary_join_element_wise(prefix, pc.cast(pa.array(ids, pa.int64()), pa.string()), "")
+
+
+def scatter(rank: np.ndarray, n: int) -> np.ndarray:
+    """Spreads popularity ranks over [0, n) (a bijection for n not divisible by the prime)."""
+    return (rank.astype(np.int64) * 2654435761) % n
+
+
+def zipf_rank(rng: np.random.Generator, a: float, n: int, size: int) -> np.ndarray:
+    """Ranks in [0, n) with P(rank = r) ~ (r + 1)^-a (tail beyond n folded back uniformly)."""
+    r = rng.zipf(a, size) - 1
+    over = r >= n
+    r[over] = rng.integers(0, n, int(over.sum()))
+    return r
+
+
+def power_rank(u: np.ndarray, alpha: float, q: float, n: int) -> np.ndarray:
+    """
+    Ranks in [0, n) from uniforms u with P(rank > x) = (1 + x / q)^-alpha
+    (folded modulo n): power-law popularity whose head does not swamp the
+    table, since q grows with n.
+    """
+    r = q * ((1.0 - u) ** (-1.0 / alpha) - 1.0)
+    return np.minimum(r, 2.0**62).astype(np.int64) % n
+
+
+def planted(names: list[str], n: int, start: int) -> dict[int, str]:
+    """Ranks at which configured names are placed: mid-table, spaced out."""
+    step = max(1, (n - start) // (len(names) + 1))
+    return {min(n - 1, start + i * step): name for i, name in enumerate(names)}
+
+
+def home_institution(authors: np.ndarray, n_inst: int) -> np.ndarray:
+    # a fixed institution per author, drawn from heavy-tailed institution sizes
+    u = ((authors.astype(np.uint64) * np.uint64(0x9E3779B1)) % np.uint64(1 << 32)).astype(np.float64) / (1 << 32)
+    return power_rank(u, 1.0, max(1.0, 0.02 * n_inst), n_inst)
+
+
+class TableWriters:
+    def __init__(self, out: Path) -> None:
+        self.out = out
+        self._writers: dict[str, pq.ParquetWriter] = {}
+        self.rows: dict[str, int] = {}
+
+    def write(self, name: str, columns: dict[str, pa.Array | np.ndarray]) -> None:
+        table = pa.table(columns, schema=SCHEMAS[name])
+        if name not in self._writers:
+            self._writers[name] = pq.ParquetWriter(self.out / name, SCHEMAS[name])
+            self.rows[name] = 0
+        self._writers[name].write_table(table, row_group_size=ROW_GROUP_ROWS)
+        self.rows[name] += table.num_rows
+
+    def close(self) -> None:
+        for w in self._writers.values():
+            w.close()
+
+
+def unique_pairs(a: np.ndarray, b: np.ndarray, n_b: int) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.unique(a.astype(np.int64) * n_b + b)
+    return keys // n_b, keys % n_b
+
+
+def generate(out: Path, n_papers: int, cfg: dict, seed: int = 0) -> dict:
+    """Writes the eight tables for n_papers papers into out; returns the row counts."""
+    tmp = out.with_name(out.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    n_authors = max(100, int(n_papers * AUTHORS_PER_PAPER))
+    n_inst = max(200, n_papers // 500)
+    chunks = [(lo, min(n_papers, lo + CHUNK_PAPERS)) for lo in range(0, n_papers, CHUNK_PAPERS)]
+    writers = TableWriters(tmp)
+
+    # fields: real top-level names first, configured field keywords planted mid-table
+    field_names = TOP_FIELDS + [f"Field {i}" for i in range(len(TOP_FIELDS), N_FIELDS)]
+    for rank, name in planted([f"Applied {k}" for k in cfg.get("field_keywords", [])], N_FIELDS, 40).items():
+        field_names[rank] = name
+    writers.write(
+        "sciscinet_fields.parquet",
+        {"fieldid": id_strings("F", np.arange(N_FIELDS)), "display_name": pa.array(field_names)},
+    )
+
+    inst_names = [f"University {i}" for i in range(n_inst)]
+    dart = list(dict.fromkeys(cfg.get("institution_whitelist", []) + cfg.get("university_keywords", [])))
+    for rank, name in planted(dart, n_inst, 25).items():
+        inst_names[rank] = name
+    writers.write(
+        "sciscinet_affiliations.parquet",
+        {"institution_id": id_strings("I", np.arange(n_inst)), "display_name": pa.array(inst_names)},
+    )
+
+    cited_count = np.zeros(n_papers, dtype=np.int64)
+    productivity = np.zeros(n_authors, dtype=np.int64)
+
+    for c, (lo, hi) in enumerate(chunks):
+        rng = np.random.default_rng([seed, c, 1])
+        m = hi - lo
+        pid = np.arange(lo, hi, dtype=np.int64)
+
+        k = 1 + rng.binomial(2, 0.4, m)
+        fp, ff = unique_pairs(np.repeat(pid, k), zipf_rank(rng, 1.3, N_FIELDS, int(k.sum())), N_FIELDS)
+        writers.write(
+            "sciscinet_paperfields.parquet",
+            {"paperid": id_strings("W", fp + PAPER_BASE), "fieldid": id_strings("F", ff)},
+        )
+
+        k = np.minimum(rng.zipf(2.0, m) + rng.poisson(1.5, m), MAX_AUTHORS)
+        total = int(k.sum())
+        authors = scatter(power_rank(rng.random(total), 1.5, max(1.0, 0.05 * n_authors), n_authors), n_authors)
+        ap, aa = unique_pairs(np.repeat(pid, k), authors, n_authors)
+        productivity += np.bincount(aa, minlength=n_authors)
+        inst = home_institution(aa, n_inst)
+        moved = rng.random(len(aa)) < 0.1
+        inst[moved] = rng.integers(0, n_inst, int(moved.sum()))
+        paper_ids, author_ids = id_strings("W", ap + PAPER_BASE), id_strings("A", aa + AUTHOR_BASE)
+        writers.write(
+            "sciscinet_paper_author_affiliation.parquet",
+            {"paperid": paper_ids, "authorid": author_ids, "institutionid": id_strings("I", inst)},
+        )
+        writers.write("sciscinet_authors_paperid.parquet", {"authorid": author_ids, "paperid": paper_ids})
+
+        k = rng.negative_binomial(2, 2 / (2 + MEAN_REFS), m)
+        citing = np.repeat(pid, k)
+        cited = scatter(power_rank(rng.random(len(citing)), 1.0, max(1.0, 0.002 * n_papers), n_papers), n_papers)
+        citing, cited = unique_pairs(citing, cited, n_papers)
+        self_ref = citing == cited
+        citing, cited = citing[~self_ref], cited[~self_ref]
+        cited_count += np.bincount(cited, minlength=n_papers)
+        writers.write(
+            "sciscinet_paperrefs.parquet",
+            {"citing_paperid": id_strings("W", citing + PAPER_BASE), "cited_paperid": id_strings("W", cited + PAPER_BASE)},
+        )
+
+    for c, (lo, hi) in enumerate(chunks):
+        rng = np.random.default_rng([seed, c, 2])
+        m = hi - lo
+        pid = np.arange(lo, hi, dtype=np.int64)
+        year = 2025 - np.minimum(rng.exponential(8.0, m).astype(np.int64), 60)
+        doi = pc.binary_join_element_wise(
+            "https://doi.org/10.",
+            pc.cast(pa.array(rng.integers(1000, 10000, m)), pa.string()),
+            pa.array(np.where(rng.random(m) < 0.02, "/data.", "/")),
+            pc.cast(pa.array(pid), pa.string()),
+            "",
+        )
+        doi = pc.if_else(pa.array(rng.random(m) < 0.1), pa.scalar(None, pa.string()), doi)
+        writers.write(
+            "sciscinet_papers.parquet",
+            {
+                "paperid": id_strings("W", pid + PAPER_BASE),
+                "doi": doi,
+                "year": year,
+                "doctype": pa.array(rng.choice(np.array(DOCTYPES, dtype=object), m, p=DOCTYPE_P), pa.string()),
+                "citation_count": cited_count[lo:hi],
+                "patent_count": rng.negative_binomial(0.1, 0.5, m),
+            },
+        )
+
+    rng = np.random.default_rng([seed, 0, 3])
+    for lo in range(0, n_authors, CHUNK_PAPERS):
+        hi = min(n_authors, lo + CHUNK_PAPERS)
+        aid = np.arange(lo, hi, dtype=np.int64)
+        prod = productivity[lo:hi]
+        h = np.minimum(prod, (np.sqrt(prod) * rng.uniform(0.5, 1.5, hi - lo)).astype(np.int64))
+        names = pc.binary_join_element_wise("Author ", pc.cast(pa.array(aid), pa.string()), "")
+        names = pc.if_else(pa.array(rng.random(hi - lo) < 0.01), pa.scalar(None, pa.string()), names)
+        writers.write(
+            "sciscinet_authors.parquet",
+            {"authorid": id_strings("A", aid + AUTHOR_BASE), "display_name": names, "h_index": h, "productivity": prod},
+        )
+    writers.close()
+
+    info = {
+        "version": SYNTH_VERSION,
+        "papers": n_papers,
+        "seed": seed,
+        "authors": n_authors,
+        "institutions": n_inst,
+        "rows": writers.rows,
+    }
+    (tmp / SYNTH_META).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    if out.exists():
+        shutil.rmtree(out)
+    tmp.rename(out)
+    return info
+
+
+def ensure_tables(out: Path, n_papers: int, cfg: dict, seed: int = 0) -> dict:
+    """Generates the tables unless out already holds them for the same size, seed and version."""
+    meta = out / SYNTH_META
+    if meta.exists():
+        info = json.loads(meta.read_text(encoding="utf-8"))
+        if (info.get("version"), info.get("papers"), info.get("seed")) == (SYNTH_VERSION, n_papers, seed):
+            return info
+    return generate(out, n_papers, cfg, seed)
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    cfg = load_config(REPO_ROOT / "configs" / "config.yaml")
+    scales = [a for a in args if not a.startswith("--")] or ["tiny"]
+    for scale in scales:
+        n = SCALES[scale] if scale in SCALES else int(scale)
+        out = BENCH / str(scale) / "raw"
+        info = generate(out, n, cfg) if "--force" in args else ensure_tables(out, n, cfg)
+        rows = " ".join(f"{k.removeprefix('sciscinet_').removesuffix('.parquet')}={v}" for k, v in info["rows"].items())
+        print(f"OK: {out} | {rows}")
+
+
+if __name__ == "__main__":
+    main()
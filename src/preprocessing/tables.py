@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import catalog
+from ids import IdCodec, detect_codec
+
+# Filters use the same (column, op, value) triples as pandas/pyarrow `filters=`,
+# e.g. [("year", ">=", 2021), ("doctype", "in", ["article", "preprint"])].
+# They are pushed into the dataset scan, so row groups whose statistics rule
+# them out are skipped and non-matching rows are dropped batch by batch,
+# before anything is converted to pandas.
+#
+# Id columns listed in `int_ids` come back as int64 (see ids.py), and an
+# integer value set for an "in" filter on a string id column is converted to
+# that column's id format, so callers can stay in integer ids throughout.
+Filter = tuple[str, str, Any]
+
+# Threads for row-group parallel scans (0 = all cores). The pipeline lowers
+# this in each worker process so processes x threads matches the machine.
+SCAN_WORKERS = 0
+
+_COMPARE = {
+    "==": lambda f, v: f == v,
+    "!=": lambda f, v: f != v,
+    "<": lambda f, v: f < v,
+    "<=": lambda f, v: f <= v,
+    ">": lambda f, v: f > v,
+    ">=": lambda f, v: f >= v,
+}
+
+
+# Local copies written by ingest_tables.py live next to the raw directory,
+# data/local/<table>/ for data/raw/<table>. A copy is used instead of the raw
+# file while its _ingest.json still matches the raw file's size and mtime.
+LOCAL_DIR = "local"
+LOCAL_LAYOUT = 1
+INGEST_META = "_ingest.json"
+
+
+def local_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.parent.parent / LOCAL_DIR / path.name
+
+
+def file_signature(path: str | Path) -> list[int]:
+    st = Path(path).stat()
+    return [st.st_size, int(st.st_mtime)]
+
+
+def local_copy(path: str | Path) -> Path | None:
+    local = local_path(path)
+    meta = local / INGEST_META
+    if not meta.exists():
+        return None
+    info = json.loads(meta.read_text(encoding="utf-8"))
+    if info.get("layout") != LOCAL_LAYOUT:
+        return None
+    if Path(path).exists() and info.get("source") != file_signature(path):
+        return None
+    return local
+
+
+def local_signature(local: Path) -> list:
+    """[name, size, mtime_ns] of every file of a local copy; changes with any re-ingest."""
+    sig = []
+    for p in sorted(local.iterdir()):
+        if p.is_file():
+            st = p.stat()
+            sig.append([p.name, st.st_size, st.st_mtime_ns])
+    return sig
+
+
+def table_signature(path: str | Path) -> list:
+    """
+    Signature of what a scan of path reads: the raw file, plus the files of
+    the local copy if one is used (row-group ids in the catalog refer to
+    them). Only the copy's files when the raw file is gone.
+    """
+    sig: list = file_signature(path) if Path(path).exists() else []
+    local = local_copy(path)
+    if local is not None:
+        sig += [LOCAL_DIR, LOCAL_LAYOUT, local_signature(local)]
+    return sig
+
+
+def open_dataset(path: str | Path) -> ds.Dataset:
+    return ds.dataset(str(local_copy(path) or path), format="parquet")
+
+
+def _base_type(typ: pa.DataType) -> pa.DataType:
+    return typ.value_type if pa.types.is_dictionary(typ) else typ
+
+
+@lru_cache(maxsize=None)
+def column_codec(path: str | Path, column: str) -> IdCodec:
+    dataset = open_dataset(path)
+    return detect_codec(dataset.head(1000, columns=[column]).column(column))
+
+
+def _value_set(values: Iterable, typ: pa.DataType, path: str | Path, col: str) -> pa.Array:
+    if isinstance(values, pa.ChunkedArray):
+        arr = values.combine_chunks()
+    elif isinstance(values, pa.Array):
+        arr = values
+    elif isinstance(values, np.ndarray):
+        arr = pa.array(values)
+    else:
+        arr = pa.array(list(values))
+    typ = _base_type(typ)
+    if pa.types.is_integer(arr.type) and not pa.types.is_integer(typ):
+        return column_codec(path, col).value_set(arr.to_numpy(), typ)
+    if not arr.type.equals(typ):
+        arr = arr.cast(typ)
+    return arr
+
+
+TypedFilter = tuple[str, str, Any]  # value: pa.Array for in / not in, else pa.Scalar
+
+
+def typed_filters(schema: pa.Schema, filters: list[Filter] | None, path: str | Path = "") -> list[TypedFilter]:
+    """Filters with values converted to the column's stored type (id value sets via the codec)."""
+    out = []
+    for col, op, value in filters or []:
+        typ = schema.field(col).type
+        if op in ("in", "not in"):
+            out.append((col, op, _value_set(value, typ, path, col)))
+        elif op in _COMPARE:
+            out.append((col, op, pa.scalar(value).cast(_base_type(typ))))
+        else:
+            raise ValueError(f"unsupported filter op: {op!r}")
+    return out
+
+
+def filter_expression(schema: pa.Schema, typed: list[TypedFilter]) -> ds.Expression | None:
+    expr = None
+    for col, op, value in typed:
+        field = ds.field(col)
+        if op == "in":
+            cond = pc.is_in(field, value_set=value)
+            if len(value) and not pa.types.is_dictionary(schema.field(col).type):
+                # Arrow prunes row groups for is_in only on small value sets;
+                # the implied [min, max] range prunes on sorted layouts at any size
+                bounds = pc.min_max(value)
+                cond = (field >= bounds["min"]) & (field <= bounds["max"]) & cond
+        elif op == "not in":
+            cond = ~pc.is_in(field, value_set=value)
+        else:
+            cond = _COMPARE[op](field, value)
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def build_filter(
+    schema: pa.Schema,
+    filters: list[Filter] | None,
+    path: str | Path = "",
+) -> ds.Expression | None:
+    return filter_expression(schema, typed_filters(schema, filters, path))
+
+
+def _stats_filters(typed: list[TypedFilter]) -> list[Filter]:
+    # catalog statistics are plain JSON values; "in" sets as sorted arrays
+    out = []
+    for col, op, value in typed:
+        if op in ("in", "not in"):
+            out.append((col, op, np.sort(value.drop_null().to_numpy(zero_copy_only=False))))
+        else:
+            out.append((col, op, value.as_py()))
+    return out
+
+
+def catalog_entry(path: str | Path) -> dict | None:
+    return catalog.table_entry(path, table_signature(path))
+
+
+def prepare_scan(path: str | Path, filters: list[Filter] | None = None) -> tuple[ds.Dataset, ds.Expression | None]:
+    """
+    Dataset and filter expression for a filtered scan of path. With a fresh
+    catalog entry (see catalog.py) the dataset is narrowed to the row groups
+    whose statistics can match every filter before Arrow reads anything.
+    """
+    dataset = open_dataset(path)
+    typed = typed_filters(dataset.schema, filters, path)
+    expr = filter_expression(dataset.schema, typed)
+
+    entry = catalog_entry(path) if typed else None
+    if entry is not None:
+        keep = catalog.matching_row_groups(entry, _stats_filters(typed))
+        if len(keep) < len(entry["row_groups"]):
+            by_file: dict[str, list[int]] = {}
+            for rg in keep:
+                by_file.setdefault(rg["file"], []).append(rg["id"])
+            frags = [
+                frag.subset(row_group_ids=by_file[Path(frag.path).name])
+                for frag in dataset.get_fragments()
+                if Path(frag.path).name in by_file
+            ]
+            dataset = ds.FileSystemDataset(frags, dataset.schema, dataset.format, dataset.filesystem)
+    return dataset, expr
+
+
+def estimate_rows(path: str | Path, filters: list[Filter] | None = None) -> float | None:
+    """Rows a filtered scan of path would return, from the catalog; None without a fresh entry."""
+    entry = catalog_entry(path)
+    if entry is None:
+        return None
+    dataset = open_dataset(path)
+    return catalog.estimate_rows(entry, _stats_filters(typed_filters(dataset.schema, filters, path)))
+
+
+def encode_ids(table: pa.Table, path: str | Path, int_ids: Iterable[str]) -> pa.Table:
+    int_ids = list(int_ids)
+    if not int_ids:
+        return table
+    for col in int_ids:
+        i = table.schema.get_field_index(col)
+        table = table.set_column(i, col, column_codec(path, col).encode(table.column(col)))
+    # the stored pandas metadata would turn the id columns back into strings
+    return table.replace_schema_metadata(None)
+
+
+def scan_workers() -> int:
+    return SCAN_WORKERS or os.cpu_count() or 1
+
+
+def row_group_fragments(dataset: ds.Dataset, expr: ds.Expression | None) -> list[ds.Fragment]:
+    """One fragment per row group, in file order; row groups whose statistics rule out expr are dropped."""
+    frags = []
+    for frag in dataset.get_fragments(filter=expr):
+        frags.extend(frag.split_by_row_group(expr))
+    return frags
+
+
+def scan_table(
+    path: str | Path,
+    columns: list[str] | None = None,
+    filters: list[Filter] | None = None,
+    int_ids: Iterable[str] = (),
+    workers: int | None = None,
+) -> pa.Table:
+    """
+    Filtered scan into one Table. With more than one worker, row groups are
+    filtered and id-encoded in a thread pool (Arrow releases the GIL) and
+    concatenated in file order, so the result is the same as a serial scan.
+    """
+    dataset, expr = prepare_scan(path, filters)
+    int_ids = list(int_ids)
+    workers = workers or scan_workers()
+
+    frags = row_group_fragments(dataset, expr) if workers > 1 else []
+    if len(frags) > 1:
+
+        def scan(frag: ds.Fragment) -> pa.Table:
+            part = frag.to_table(schema=dataset.schema, columns=columns, filter=expr, use_threads=False)
+            return encode_ids(part, path, int_ids)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(frags))) as pool:
+            return pa.concat_tables(pool.map(scan, frags))
+
+    table = dataset.to_table(columns=columns, filter=expr)
+    return encode_ids(table, path, int_ids)
+
+
+def scan_batches(
+    path: str | Path,
+    columns: list[str] | None = None,
+    filters: list[Filter] | None = None,
+    int_ids: Iterable[str] = (),
+    batch_size: int = 1 << 20,
+) -> Iterator[pa.Table]:
+    """
+    Filtered scan yielded one record batch at a time (as a small Table), so
+    memory is bounded by batch_size rather than the table. Stopping the
+    iteration stops the scan.
+    """
+    dataset, expr = prepare_scan(path, filters)
+    scanner = dataset.scanner(columns=columns, filter=expr, batch_size=batch_size)
+    int_ids = list(int_ids)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield encode_ids(pa.Table.from_batches([batch]), path, int_ids)
+
+
+def read_parquet(
+    path: str | Path,
+    columns: list[str] | None = None,
+    filters: list[Filter] | None = None,
+    int_ids: Iterable[str] = (),
+) -> pd.DataFrame:
+    return scan_table(path, columns, filters, int_ids).to_pandas()
+
+
+def year_filters(year_from: int, year_to: int, column: str = "year") -> list[Filter]:
+    return [(column, ">=", int(year_from)), (column, "<=", int(year_to))]
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Iterable
 import json
+import os
 import re
 import yaml
+import pyarrow as pa
+
+from graph_arrow import GRAPH_OUTPUTS, ArrowGraph, write_graph, write_table
 
 def load_config(path: str | Path = "configs/config.yaml") -> dict:
     path = Path(path)
@@ -19,5 +24,53 @@ def compile_keywords(keywords: list[str]) -> re.Pattern:
 def write_json(obj: dict, out_path: str | Path) -> None:
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8") as f:
+    # write-then-rename: readers see the old or the new file, never a partial one
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, out_path)
+
+def _nested(obj: object, pad: str) -> str:
+    # obj as json.dump(indent=2) prints it at this depth (escaped strings hold no newlines)
+    return json.dumps(obj, ensure_ascii=False, indent=2).replace("\n", "\n" + pad)
+
+def write_json_stream(out_path: str | Path, head: dict, arrays: dict[str, Iterable]) -> None:
+    """
+    Writes the same file as write_json({**head, **arrays}), but each array is
+    consumed from an iterator and written item by item, so the document (and
+    its item list) is never held in memory at once.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write("{")
+        sep = "\n  "
+        for key, value in head.items():
+            f.write(sep + json.dumps(key, ensure_ascii=False) + ": " + _nested(value, "  "))
+            sep = ",\n  "
+        for key, items in arrays.items():
+            f.write(sep + json.dumps(key, ensure_ascii=False) + ": ")
+            sep = ",\n  "
+            opened = False
+            for item in items:
+                f.write((",\n    " if opened else "[\n    ") + _nested(item, "    "))
+                opened = True
+            f.write("\n  ]" if opened else "[]")
+        f.write("}" if sep == "\n  " else "\n}")
+    os.replace(tmp, out_path)
+
+def write_output(obj: dict | ArrowGraph | pa.Table, out_path: str | Path) -> None:
+    """write_json, plus the Arrow files of graph outputs (graph_arrow.py); tables as Arrow IPC."""
+    out_path = Path(out_path)
+    if isinstance(obj, pa.Table):
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        write_table(obj, out_path)
+        return
+    if isinstance(obj, ArrowGraph):
+        write_graph(obj, out_path)
+        write_json_stream(out_path, {"meta": obj.meta}, {"nodes": obj.iter_node_rows(), "edges": obj.iter_edge_rows()})
+        return
+    if out_path.name in GRAPH_OUTPUTS:
+        write_graph(obj, out_path)
+    write_json(obj, out_path)